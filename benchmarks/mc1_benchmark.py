@@ -0,0 +1,189 @@
+#!/usr/bin/python3
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1 import synthetic
+from mc1.codec import dcode, xcode
+from mc1.dump import render_dump
+from mc1.editscript import compile_script, run_script
+from mc1.patch import apply_runs, save_patched
+
+"""
+This script measures the hot paths of the tools, on synthetic save-files & Tile files (see mc1/synthetic.py:
+the real game files cannot be shipped), and records the results as JSON.
+License: GPLv3
+
+USAGE:  python3 <script> [--repeat N] [--only NAME[,NAME...]] [-o results.json] [--compare previous.json]
+
+Each scenario is run N times (default: 5) on the same generated files (the random generators are seeded), the
+minimum, median & mean times are recorded. With --compare, the medians are compared with a previous run
+(ex: the results of the previous version), a ratio > 1 means slower.
+
+Scenarios:
+  decode_per_byte   decode a save-file with dcode(), byte per byte (the original decoder)
+  decode            decode a save-file with xcode() (whole buffer)
+  dump              format the dump of a save-file (mc1_decode_savefile.py)
+  dump_csv          same, --csv-friendly
+  export_csv        export 200 save-files as a CSV table, with the named fields (mc1_export_savefiles.py)
+  edit_compile      compile an edit script of 10^5 modifications & apply it (mc1_batch_modify_savefile.py)
+  edit_script       apply an edit script of 10^5 modifications (mc1_modify_savefile.py --stdin)
+  edit_write        write a modified save-file (temporary file + rename)
+  tile_unpack       decode the 128 tiles of a Tile file (NumPy)
+  tile_png          encode the 128 tiles of a Tile file as PNG images (scaled x2)
+  tile_extract      extract a Tile file (decode + one PNG file per tile)
+  tile_atlas        extract a Tile file as an atlas (decode + one PNG + JSON index)
+
+Ex: python3 mc1_benchmark.py -o before.json
+    (modify the code)
+    python3 mc1_benchmark.py -o after.json --compare before.json
+"""
+
+EDITS = 10 ** 5
+EXPORTED_SAVEFILES = 200
+
+
+def scenarios(work_dir):
+    """
+    Prepare the data of the scenarios.
+    :return: list of (name, function to time, number of items processed per run, unit of the items)
+    """
+    data = synthetic.savefile_data(seed=1)
+    decoded = xcode(data)
+    savefile = synthetic.write_savefiles(os.path.join(work_dir, 'save'), 1)[0]
+    savefiles = synthetic.write_savefiles(os.path.join(work_dir, 'corpus'), EXPORTED_SAVEFILES, seed=100)
+    tilefile = synthetic.write_tilefiles(os.path.join(work_dir, 'tiles'), 1)[0]
+    out_dir = os.path.join(work_dir, 'out')
+    os.makedirs(out_dir)
+
+    # 10^5 modifications of 1 to 8 bytes, all over the save-file (repeatable)
+    lines = ["{0:#x} {1}".format((i * 7919) % (len(data) - 8), ' '.join(str((i + j) & 0xFF) for j in range(i % 8 + 1)))
+             for i in range(EDITS)]
+    patched = apply_runs(data, run_script(data, lines))
+
+    def decode_per_byte():
+        return bytes(dcode(offset, value) for offset, value in enumerate(data))
+
+    def edit_compile():  # the batch editor: compiled once, applied to each save-file
+        return apply_runs(data, compile_script(lines, len(data)).runs(data))
+
+    def edit_script():
+        return apply_runs(data, run_script(data, lines))
+
+    def export_csv():
+        from mc1.export import export
+        export(savefiles, os.path.join(out_dir, 'export.csv'), 'csv', 'fields', warn=lambda message: None)
+
+    def tile_unpack():
+        from mc1.tiles import TileFile
+        with TileFile(tilefile) as tile_file:
+            return tile_file.tiles()
+
+    tiles = tile_unpack()
+
+    def tile_png():
+        from mc1.tiles import tile_image
+        for tile_pixels in tiles:
+            tile_image(tile_pixels, 2).save(io.BytesIO(), "PNG")
+
+    def tile_extract(atlas=False):
+        from mc1.extract import extract_tilefile
+        tilefile_, outputs, error, elapsed = extract_tilefile(tilefile, out_dir, 2, atlas)
+        if error:
+            raise ValueError(error)
+
+    return [
+        ('decode_per_byte', decode_per_byte, len(data), 'bytes'),
+        ('decode', lambda: xcode(data), len(data), 'bytes'),
+        ('dump', lambda: render_dump(data, decoded), len(data), 'bytes'),
+        ('dump_csv', lambda: render_dump(data, decoded, csv_friendly=True), len(data), 'bytes'),
+        ('export_csv', export_csv, EXPORTED_SAVEFILES, 'save-files'),
+        ('edit_compile', edit_compile, EDITS, 'edits'),
+        ('edit_script', edit_script, EDITS, 'edits'),
+        ('edit_write', lambda: save_patched(savefile, patched, savefile + '.out'), 1, 'save-files'),
+        ('tile_unpack', tile_unpack, len(tiles), 'tiles'),
+        ('tile_png', tile_png, len(tiles), 'tiles'),
+        ('tile_extract', tile_extract, len(tiles), 'tiles'),
+        ('tile_atlas', lambda: tile_extract(atlas=True), len(tiles), 'tiles'),
+    ]
+
+
+def measure(function, repeat):
+    """
+    :return: list of the elapsed seconds of each run (after a first, untimed, run: imports, caches...)
+    """
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the hot paths of the tools, on synthetic files.')
+    parser.add_argument('--repeat', type=int, default=5, metavar='N', help='Runs per scenario (default: 5)')
+    parser.add_argument('--only', metavar='NAME', help='Only run these scenarios (comma separated)')
+    parser.add_argument('-o', '--output', metavar='results.json', help='Write the results in a JSON file')
+    parser.add_argument('--compare', metavar='previous.json', help='Compare the results with a previous run')
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        sys.exit("ERROR: --repeat must be positive")
+
+    previous = {}
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                previous = json.load(f)['results']
+        except (OSError, ValueError, KeyError) as e:
+            sys.exit("ERROR: %s is not a benchmark result (%s)" % (args.compare, e))
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='mc1_benchmark_') as work_dir:
+        selected = scenarios(work_dir)
+        if args.only:
+            names = [name.strip() for name in args.only.split(',')]
+            unknown = set(names) - {name for name, _, _, _ in selected}
+            if unknown:
+                sys.exit("ERROR: unknown scenario(s): %s" % ', '.join(sorted(unknown)))
+            selected = [scenario for scenario in selected if scenario[0] in names]
+
+        print("{0:16} {1:>11} {2:>11} {3:>15}{4}".format('scenario', 'median ms', 'min ms', 'items/s',
+                                                         '   vs previous' if previous else ''))
+        for name, function, items, unit in selected:
+            times = measure(function, args.repeat)
+            median = statistics.median(times)
+            results[name] = {'min': min(times), 'median': median, 'mean': statistics.mean(times),
+                             'repeat': args.repeat, 'items': items, 'unit': unit}
+            line = "{0:16} {1:11.3f} {2:11.3f} {3:>15}".format(name, median * 1000, min(times) * 1000,
+                                                               "{0:.0f} {1}".format(items / median, unit))
+            if name in previous:
+                line += "   x{0:.2f}".format(median / previous[name]['median'])
+            print(line)
+
+    if args.output:
+        report = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'version': git_version(),
+                  'python': platform.python_version(), 'platform': platform.platform(), 'results': results}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""
+Utilities for the game "The Magic Candle 1", 1989 MS-DOS version.
+License: GPLv3
+
+Shared, importable code used by the scripts of the repository
+(savefile_decoding, savefile_modify, tiles_decoding).
+
+  codec      the XOR encoding of the save-files
+  dump       the save-file decoder: the rows of decoded values (as printed by mc1_decode_savefile.py)
+  patch      the save-file editor: transactional modifications (mc1_modify_savefile.py)
+  schema     the named fields of a save-file
+  tiles      the Tile file decoder (header, tiles, images, atlas)
+  timings    the per-phase timings of the scripts (--timings, --timings-json, --profile)
+  ...        backups, editscript, batch, export, snapshots, diff, search, watch, extract, tileindex, maps, console,
+             server
+
+Importing a module has no side effect. The scripts are thin command line entry points: each one has a
+main(argv=None) function, so it can also be called from Python. NumPy & PIL are only loaded by the code which
+needs them (ex: reading the header of a Tile file, dumping or editing a save-file do not load them).
+"""
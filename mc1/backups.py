@@ -0,0 +1,245 @@
+"""
+The history of the save-files modified in place: every version can be restored (undo).
+License: GPLv3
+
+The versions are kept in a hidden directory, next to the save-files (no copies of the save-files piling up):
+
+.mc1_backups/
+  objects/<sha1>     full contents of save-files, stored once (the name is the SHA-1 of the content)
+  <SAVEFILE>.jsonl   the history of a save-file: one version per line (JSON), appended at each modification
+
+A version is either a base (its full content is in objects/) or a delta from its parent version: the runs of
+modified bytes (offset, old bytes, new bytes, as stored in the file: encoded). Ex:
+{"id": 2, "parent": 1, "date": "2026-10-16 12:00:00", "sha1": "4f3c...", "runs": [[456, "3e21", "4f4f"]]}
+
+- A version is rebuilt from the nearest base before it, by applying the deltas in order: the history file of the
+  save-file is the only file read (plus one object). A base is stored every BASE_INTERVAL deltas at most.
+- When the save-file does not match its last version (first modification, or modified by the game since),
+  its current content is stored as a new base first: nothing is ever lost.
+- A restored version ("restored": <id>) has the position of the version it restores: undoing twice goes back
+  2 versions (and not back & forth).
+"""
+import hashlib
+import json
+import os
+import time
+
+from mc1 import timings
+from mc1.patch import write_atomic
+
+BACKUP_DIR = '.mc1_backups'
+OBJECTS_DIR = 'objects'
+HISTORY_EXTENSION = '.jsonl'
+BASE_INTERVAL = 64  # maximum number of deltas between 2 bases
+
+
+def backup_dir(savefile):
+    """
+    :return: the directory of the backups of a save-file
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(savefile)), BACKUP_DIR)
+
+
+def history_name(savefile):
+    """
+    :return: the name of the history file of a save-file
+    """
+    return os.path.join(backup_dir(savefile), os.path.basename(savefile) + HISTORY_EXTENSION)
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def delta(old, new, runs=None):
+    """
+    :param runs: the modified runs, if known (see mc1.patch.coalesce(): list of (offset, values)): only their bytes
+    are stored, the contents are not compared
+    :return: the runs of modified bytes: list of [offset, old bytes (hexa), new bytes (hexa)]
+    """
+    if runs is not None:
+        return [[offset, old[offset:offset + len(values)].hex(), new[offset:offset + len(values)].hex()]
+                for offset, values in runs]
+    runs = []
+    start = None
+    for offset in range(min(len(old), len(new)) + 1):
+        if offset < len(old) and offset < len(new) and old[offset] != new[offset]:
+            if start is None:
+                start = offset
+        elif start is not None:
+            runs.append([start, old[start:offset].hex(), new[start:offset].hex()])
+            start = None
+    return runs
+
+
+def load_history(savefile):
+    """
+    :return: the versions of a save-file (list of dict, the id of a version is its position + 1)
+    A torn last line (an append interrupted by a crash, before the save-file was written) is removed.
+    """
+    name = history_name(savefile)
+    try:
+        with open(name, 'rb') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+    history = []
+    for number, line in enumerate(lines, 1):
+        try:
+            if not line.endswith(b'\n'):
+                raise ValueError("incomplete line")
+            if line.strip():
+                history.append(json.loads(line))
+        except ValueError as e:
+            if number < len(lines):
+                raise ValueError("Corrupted history (%s), line %d: %s" % (name, number, e))
+            with open(name, 'r+b') as f:  # the next version is appended after the last complete line
+                f.truncate(sum(len(line) for line in lines[:-1]))
+    return history
+
+
+def find_version(history, version_id):
+    if not 1 <= version_id <= len(history):
+        raise ValueError("Unknown version: %s (the history has %d versions)" % (version_id, len(history)))
+    return history[version_id - 1]
+
+
+def current_version(history, data):
+    """
+    :return: the last version whose content is 'data' (None: 'data' is not in the history)
+    """
+    sha1 = content_hash(data)
+    for version in reversed(history):
+        if version['sha1'] == sha1:
+            return version
+    return None
+
+
+def _depth(history, version):
+    """
+    :return: number of deltas between the version and its base
+    """
+    depth = 0
+    while not version.get('base'):
+        version = find_version(history, version['parent'])
+        depth += 1
+    return depth
+
+
+def _add_version(savefile, history, version, data):
+    """
+    Append a version to the history of a save-file (and store its content, for a base).
+    """
+    version = dict(id=len(history) + 1, parent=version.pop('parent'), date=time.strftime('%Y-%m-%d %H:%M:%S'),
+                   sha1=content_hash(data), **version)
+    directory = backup_dir(savefile)
+    if version.get('base'):
+        objects = os.path.join(directory, OBJECTS_DIR)
+        os.makedirs(objects, exist_ok=True)
+        obj = os.path.join(objects, version['sha1'])
+        if not os.path.exists(obj):  # stored once, whatever the number of save-files/versions with this content
+            write_atomic(obj, data)
+    os.makedirs(directory, exist_ok=True)
+    with open(history_name(savefile), 'a') as f:
+        f.write(json.dumps(version) + '\n')
+    history.append(version)
+    return version
+
+
+def record(savefile, old, new, restored=None, runs=None):
+    """
+    Record a modification of a save-file in its history. To be called BEFORE the save-file is written.
+    :param savefile: name of the save-file
+    :param old: the current content of the save-file
+    :param new: the modified content
+    :param restored: id of the version restored by the modification (see restore())
+    :param runs: the modified runs, if known (see delta())
+    :return: the new version (dict)
+    """
+    history = load_history(savefile)
+    current = current_version(history, old)
+    if current is None:  # first modification, or the save-file has been modified by something else
+        current = _add_version(savefile, history, {'parent': None, 'base': True}, old)
+    version = {'parent': current['id'], 'runs': delta(old, new, runs)}
+    if restored is not None:
+        version['restored'] = restored
+    if len(old) != len(new) or _depth(history, current) + 1 >= BASE_INTERVAL:
+        version['base'] = True
+    return _add_version(savefile, history, version, new)
+
+
+def rebuild(savefile, version_id, history=None):
+    """
+    :return: the content of a version of a save-file (bytes)
+    """
+    history = history if history is not None else load_history(savefile)
+    version = find_version(history, version_id)
+    deltas = []
+    while not version.get('base'):
+        deltas.append(version)
+        version = find_version(history, version['parent'])
+    with open(os.path.join(backup_dir(savefile), OBJECTS_DIR, version['sha1']), 'rb') as f:
+        data = bytearray(f.read())
+    for version in reversed(deltas):
+        for offset, old_bytes, new_bytes in version['runs']:
+            data[offset:offset + len(new_bytes) // 2] = bytes.fromhex(new_bytes)
+    if content_hash(data) != find_version(history, version_id)['sha1']:
+        raise ValueError("Corrupted history (%s): version %s cannot be rebuilt" % (history_name(savefile), version_id))
+    return bytes(data)
+
+
+def _position(history, version):
+    """
+    :return: the version which gives its position to a version (a restored version has the position of the
+    version it restores)
+    """
+    while 'restored' in version:
+        version = find_version(history, version['restored'])
+    return version
+
+
+def undo_target(history, data, steps=1):
+    """
+    :param data: the current content of the save-file
+    :return: id of the version 'steps' versions before the current one
+    """
+    version = current_version(history, data)
+    if version is None:
+        raise ValueError("The save-file has been modified since its last version: use the id of a version")
+    version = _position(history, version)
+    for step in range(steps):
+        if version['parent'] is None:
+            raise ValueError("There are only %d version(s) before the current one" % step)
+        version = _position(history, find_version(history, version['parent']))
+    return version['id']
+
+
+def restore(savefile, version_id, out=None):
+    """
+    Restore a version of a save-file: either in a new file ('out'), or in the save-file itself (recorded as a
+    new version, which can be undone too).
+    :return: the restored version (dict)
+    """
+    with timings.phase('rebuild'):
+        history = load_history(savefile)
+        data = rebuild(savefile, version_id, history)
+    if out:
+        write_atomic(out, data, mode_from=savefile)
+    else:
+        with open(savefile, 'rb') as f:
+            current = f.read()
+        if current != data:
+            with timings.phase('backup'):
+                record(savefile, current, data, restored=version_id)
+            write_atomic(savefile, data)
+    return find_version(history, version_id)
+
+
+def undo(savefile, steps=1, out=None):
+    """
+    Restore the version 'steps' versions before the current one (see restore()).
+    :return: the restored version (dict)
+    """
+    with open(savefile, 'rb') as f:
+        data = f.read()
+    return restore(savefile, undo_target(load_history(savefile), data, steps), out)
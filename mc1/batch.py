@@ -0,0 +1,97 @@
+"""
+Apply the same modifications to many Magic Candle 1 save-files at once.
+License: GPLv3
+
+The edit script (same format as the '--stdin' option of mc1_modify_savefile.py, see mc1/editscript.py)
+is compiled once (see compile_script()), then the save-files are modified by a pool of processes.
+Each save-file is modified as a transaction: an error on one file does not stop the others.
+"""
+import concurrent.futures
+import glob
+import os
+import time
+
+from mc1.patch import apply_runs, save_patched
+
+_script = None  # the compiled edit script, sent once to each worker process (see _init_worker())
+
+
+def expand_savefiles(patterns):
+    """
+    Expand the glob patterns (ex: 'saves/**/*.MCS'), the names which are not patterns are kept as is.
+    :return: list of save-file names (sorted for each pattern, without duplicates)
+    """
+    savefiles = []
+    seen = set()
+    for pattern in patterns:
+        names = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for name in names:
+            if name not in seen:
+                seen.add(name)
+                savefiles.append(name)
+    return savefiles
+
+
+def out_names(savefiles, out_dir):
+    """
+    Names of the modified save-files when they are written in 'out_dir' (None: the save-files are modified).
+    The directory tree of the save-files is mirrored, so that files with the same name do not collide.
+    :return: list of names (or of None)
+    """
+    if not out_dir:
+        return [None] * len(savefiles)
+    paths = [os.path.abspath(savefile) for savefile in savefiles]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ''
+    return [os.path.join(out_dir, os.path.relpath(path, root)) for path in paths]
+
+
+def patch_savefile(savefile, script, out=None):
+    """
+    Apply a compiled edit script to one save-file.
+    :param savefile: name of the save-file
+    :param script: the edit script (see mc1.editscript.compile_script())
+    :param out: name of the new save-file (None: the save-file is modified, after a backup)
+    :return: (savefile, error message or None, elapsed seconds)
+    """
+    start = time.perf_counter()
+    try:
+        with open(savefile, 'rb') as f:
+            data = f.read()
+        runs = script.runs(data)
+        if out:
+            os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+        save_patched(savefile, apply_runs(data, runs), out, data, runs)
+        error = None
+    except (OSError, ValueError) as e:  # PatchError, or a corrupted history (see mc1/backups.py)
+        error = str(e)
+    return savefile, error, time.perf_counter() - start
+
+
+def _init_worker(script):
+    global _script
+    _script = script
+
+
+def _patch_worker(names):
+    return patch_savefile(names[0], _script, names[1])
+
+
+def patch_savefiles(savefiles, script, out_dir=None, jobs=None):
+    """
+    Apply a compiled edit script to many save-files, in a pool of processes.
+    :param savefiles: list of save-file names
+    :param script: the edit script (see mc1.editscript.compile_script())
+    :param out_dir: directory of the modified save-files (None: the save-files are modified, after a backup)
+    :param jobs: number of processes (default: number of CPUs). 1: no pool, everything is done in this process
+    :return: generator of (savefile, error message or None, elapsed seconds), in the order of 'savefiles'
+    """
+    tasks = list(zip(savefiles, out_names(savefiles, out_dir)))
+    if jobs == 1 or len(tasks) <= 1:
+        for savefile, out in tasks:
+            yield patch_savefile(savefile, script, out)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                                initargs=(script,)) as pool:
+        chunksize = max(1, len(tasks) // (4 * (jobs or os.cpu_count() or 1)))
+        yield from pool.map(_patch_worker, tasks, chunksize=chunksize)
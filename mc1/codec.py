@@ -0,0 +1,74 @@
+"""
+Decode/encode a Magic Candle 1 save-file.
+License: GPLv3
+
+Those files are encoded by a XOR function which also depends on the OFFSET.
+To get a real (decoded) value from the save file you must apply the following formula (to each byte):
+
+real_value = ( (offset of the save_file_value byte + 0xa5) & 0xFF ) XOR save_file_value
+
+Encoding uses the very same formula (XOR twice with the same key gives back the original value).
+
+Since only the last byte of 'offset + 0xA5' is kept, the key repeats itself every 256 bytes.
+The 256 key bytes are computed once (KEYSTREAM) and a whole buffer is XOR-ed in a single
+operation: the buffer and the key are converted to (big) integers, XOR-ed, and converted back to bytes.
+This is much faster than calling dcode() once per byte from a Python loop.
+"""
+import functools
+
+MAGIC = 0xA5  # magic number used by the game for the encoding
+
+# Key used for the offsets 0x00 to 0xFF, then it repeats itself (0x100 uses the same key as 0x00, etc.)
+KEYSTREAM = bytes((offset + MAGIC) & 0xFF for offset in range(256))
+
+
+def dcode(byte_offset, byte_value):
+    """
+    Decode (or encode, the method is the same) the byte value located at the offset.
+    The offset is the byte number of the byte to decode/encode, starting from the beginning of the save-file.
+    '0xA5' is a magic number used by the game for the operation.
+    '& 0xFF' is used to keep only the byte value (prevents overflows)
+    :param byte_offset: offset of the byte that we are encoding/decoding (starting from the beginning of the file)
+    :param byte_value: encoding/decoding the byte located at the position 'offset' in the save-file
+    """
+    return ((byte_offset + MAGIC) ^ byte_value) & 0xFF
+
+
+def keystream(length, start=0):
+    """
+    Get the key bytes used to decode/encode 'length' bytes, the first one being located at the offset 'start'.
+    :param length: number of key bytes
+    :param start: offset (in the save-file) of the first byte
+    :return: bytes
+    """
+    shift = start & 0xFF
+    key = KEYSTREAM[shift:] + KEYSTREAM[:shift]  # the key, starting at the right offset
+    return (key * (length // 256 + 1))[:length]
+
+
+@functools.lru_cache(maxsize=64)
+def _key_as_int(length, shift):
+    """
+    The key, converted to an integer (cached: most save-files have the same length).
+    """
+    return int.from_bytes(keystream(length, shift), 'little')
+
+
+def xcode(data, start=0):
+    """
+    Decode (or encode, the method is the same) a whole buffer in a single pass.
+    The result is exactly the same as calling dcode() on each byte.
+    :param data: bytes-like object (bytes, bytearray, mmap, memoryview...) to decode/encode
+    :param start: offset of the first byte of 'data' in the save-file (0 when 'data' is the whole save-file)
+    :return: the decoded/encoded bytes
+    """
+    length = len(data)
+    if not length:
+        return b''
+    value = int.from_bytes(data, 'little') ^ _key_as_int(length, start & 0xFF)
+    return value.to_bytes(length, 'little')
+
+
+# Both operations are the same, these names only make the calling code easier to read
+decode = xcode
+encode = xcode
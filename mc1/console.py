@@ -0,0 +1,67 @@
+"""
+Compact console rendering of the tiles, with 24-bit ("truecolor") escape codes.
+License: GPLv3
+
+Each character cell shows _2_ pixels: the upper half block glyph ("\\u2580") is drawn with the color of the top
+pixel (foreground) over the color of the bottom pixel (background), so a 16x14 tile takes 16x7 characters.
+The colors are the exact EGA RGB values (see mc1/tiles.py), which most modern terminals support.
+
+The escape codes of the 16 foreground colors, 16 background colors & 16x16 (foreground, background) pairs are
+computed once. An escape code is only written when the colors change: consecutive cells with the same colors
+are just glyphs, and a cell whose 2 pixels have the same color is a space (only its background color matters).
+The whole output (a tile, or a grid of tiles) is built as a single string, written at once.
+"""
+import numpy as np
+
+from mc1.tiles import PALETTE, tile_sheet
+
+UPPER_HALF_BLOCK = "\u2580"
+RESET = "\033[0m"
+
+FOREGROUND = ["\033[38;2;{0};{1};{2}m".format(*rgb) for rgb in PALETTE]
+BACKGROUND = ["\033[48;2;{0};{1};{2}m".format(*rgb) for rgb in PALETTE]
+PAIRS = [["\033[38;2;{0};{1};{2};48;2;{3};{4};{5}m".format(*(top + bottom)) for bottom in PALETTE]
+         for top in PALETTE]
+
+
+def halfblock_lines(pixels):
+    """
+    :param pixels: 2 dimensional array of EGA color numbers (an odd last row is completed with black)
+    :return: list of the console lines (2 rows of pixels per line)
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    if len(pixels) % 2:
+        pixels = np.concatenate([pixels, np.zeros((1, pixels.shape[1]), dtype=np.uint8)])
+    lines = []
+    for top_row, bottom_row in zip(pixels[0::2].tolist(), pixels[1::2].tolist()):
+        cells = []
+        top_color = bottom_color = None
+        for top, bottom in zip(top_row, bottom_row):
+            if top == bottom:  # a space only needs the background color
+                if bottom != bottom_color:
+                    cells.append(BACKGROUND[bottom])
+                    bottom_color = bottom
+                cells.append(' ')
+                continue
+            if top != top_color and bottom != bottom_color:
+                cells.append(PAIRS[top][bottom])
+            elif top != top_color:
+                cells.append(FOREGROUND[top])
+            elif bottom != bottom_color:
+                cells.append(BACKGROUND[bottom])
+            top_color, bottom_color = top, bottom
+            cells.append(UPPER_HALF_BLOCK)
+        cells.append(RESET)
+        lines.append(''.join(cells))
+    return lines
+
+
+def render_tiles(tiles, columns=16):
+    """
+    :param tiles: the decoded tiles, NumPy array (tiles, TILE_HEIGHT, TILE_WIDTH) (see mc1.tiles.decode_tiles())
+    :param columns: number of tiles per row
+    :return: the console output of the grid of tiles (single string)
+    """
+    if not len(tiles):
+        return ''
+    return '\n'.join(halfblock_lines(tile_sheet(tiles, max(1, min(columns, len(tiles)))))) + '\n'
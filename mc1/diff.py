@@ -0,0 +1,130 @@
+"""
+Compare decoded Magic Candle 1 save-files (snapshots of the same game, saved one after the other).
+License: GPLv3
+
+The snapshots are read & decoded all at once as a NumPy matrix (one row per snapshot, one column per offset):
+the encoded bytes are XOR-ed with the key of each offset (see mc1/codec.py), then each row is compared with
+the next one. This gives, for each step (snapshot N => snapshot N+1), the offsets whose decoded value changed.
+
+The changes are displayed with the same layout as the dump (6 bytes/row, same 'pad' offsets, see mc1/dump.py):
+0x1cd 	0x4c 0x55 0x4b 0x41 0x53 0x00	0x4d 0x55 0x4b 0x41 0x53 0x00	 76  85  75  65  83   0	 77  85  75  65  83   0	LUKAS.	MUKAS.
+=> offset, old values (hexa), new values (hexa), old values (decimal), new values (decimal), old chars, new chars
+The changed values are colored (except with csv_friendly).
+"""
+import numpy as np
+
+from mc1.codec import keystream
+from mc1.dump import (CHARS, CHARS_COLORED, DECIMAL, DECIMAL_COLORED, EMPTY_DECIMAL, EMPTY_HEXA, BLOCK_SIZE,
+                      GROUP_SEPARATOR, HEXA, HEXA_COLORED, PAD, SEP_CHARS, SEP_COLS, SEP_COLS_CSV, SEP_GROUPS,
+                      rows_around, row_spans)
+
+
+def decode_matrix(snapshots):
+    """
+    Decode many save-files of the same length at once.
+    :param snapshots: list of (encoded) save-file contents (bytes)
+    :return: NumPy matrix (uint8), one row per snapshot
+    """
+    if not snapshots:
+        return np.zeros((0, 0), dtype=np.uint8)
+    length = len(snapshots[0])
+    for i, snapshot in enumerate(snapshots):
+        if len(snapshot) != length:
+            raise ValueError("Snapshot %d has a different length (%s bytes, %s expected)" % (
+                i + 1, hex(len(snapshot)), hex(length)))
+    matrix = np.frombuffer(b''.join(snapshots), dtype=np.uint8).reshape(len(snapshots), length)
+    return matrix ^ np.frombuffer(keystream(length), dtype=np.uint8)  # the key is the same for every row
+
+
+def load_matrix(savefiles):
+    """
+    Read & decode save-files (see decode_matrix()).
+    """
+    snapshots = []
+    for savefile in savefiles:
+        with open(savefile, 'rb') as f:
+            snapshots.append(f.read())
+    return decode_matrix(snapshots)
+
+
+def step_changes(matrix):
+    """
+    Compare each snapshot with the next one.
+    :param matrix: decoded snapshots (see decode_matrix())
+    :return: boolean matrix (N-1 rows): True where the value changed between snapshot i and i+1
+    """
+    return matrix[1:] != matrix[:-1]
+
+
+def changed_offsets(matrix):
+    """
+    :return: list (one item per step) of NumPy arrays of the changed offsets
+    """
+    changes = step_changes(matrix)
+    steps, offsets = np.nonzero(changes)
+    bounds = np.searchsorted(steps, np.arange(len(changes) + 1))
+    return [offsets[bounds[i]:bounds[i + 1]] for i in range(len(changes))]
+
+
+def change_summary(matrix):
+    """
+    For each offset which changed at least once: number of steps where it changed & number of distinct values.
+    :return: list of (offset, number of changes, number of distinct values)
+    """
+    counts = step_changes(matrix).sum(axis=0)
+    summary = []
+    for offset in np.nonzero(counts)[0]:
+        summary.append((int(offset), int(counts[offset]), len(np.unique(matrix[:, offset]))))
+    return summary
+
+
+def render_step(old, new, offsets, csv_friendly=False, context=0, pad=PAD):
+    """
+    Format the rows which changed between 2 decoded snapshots.
+    :param old: decoded content of the first snapshot (bytes or NumPy array)
+    :param new: decoded content of the second snapshot
+    :param offsets: the changed offsets (see changed_offsets())
+    :param csv_friendly: if True, use a "tab" separator between all the values, and no colors
+    :param context: number of (unchanged) rows displayed before & after the changed ones
+    :return: list of lines
+    """
+    old = bytes(old)
+    new = bytes(new)
+    changed = set(int(offset) for offset in offsets)
+    sep_cols = SEP_COLS_CSV if csv_friendly else SEP_COLS
+    lines = []
+    for group in rows_around(row_spans(len(new), pad), changed, context):
+        if lines:
+            lines.append(GROUP_SEPARATOR)
+        for start, end in group:
+            cells = [[], [], [], [], [], []]  # old/new hexa, old/new decimal, old/new chars
+            for offset in range(start, end):
+                colored = offset in changed and not csv_friendly
+                hexa, decimal, chars = (HEXA_COLORED, DECIMAL_COLORED, CHARS_COLORED) if colored else (HEXA, DECIMAL, CHARS)
+                cells[0].append(hexa[old[offset]])
+                cells[1].append(hexa[new[offset]])
+                cells[2].append(decimal[old[offset]])
+                cells[3].append(decimal[new[offset]])
+                cells[4].append(chars[old[offset]])
+                cells[5].append(chars[new[offset]])
+            missing = BLOCK_SIZE - (end - start)
+            for i, empty in enumerate((EMPTY_HEXA, EMPTY_HEXA, EMPTY_DECIMAL, EMPTY_DECIMAL)):
+                cells[i] += [empty] * missing
+            lines.append(SEP_GROUPS.join(["{0:#05x}".format(start).ljust(6)] +
+                                         [sep_cols.join(group_cells) for group_cells in cells[:4]] +
+                                         [SEP_CHARS.join(group_cells) for group_cells in cells[4:]]))
+    return lines
+
+
+def render_diff(savefiles, matrix, csv_friendly=False, context=0):
+    """
+    Format the changes between each snapshot and the next one.
+    :param savefiles: names of the snapshots
+    :param matrix: decoded snapshots (see load_matrix())
+    :return: the text of the diff
+    """
+    lines = []
+    for step, offsets in enumerate(changed_offsets(matrix)):
+        lines.append("=== {0} => {1}: {2} byte(s) changed ===".format(savefiles[step], savefiles[step + 1], len(offsets)))
+        lines += render_step(matrix[step], matrix[step + 1], offsets, csv_friendly, context)
+    return '\n'.join(lines) + '\n' if lines else ''
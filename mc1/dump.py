@@ -0,0 +1,217 @@
+"""
+Print the content of a Magic Candle 1 save-file (encoded & decoded values).
+License: GPLv3
+
+The files -roughly- follow a 6 chars per blocks pattern: to analyse a file,
+we split the file in 6 chars long lines. The 6 number is related to the
+number of heroes (ex: the first 6 values of the file are the current STRENGTH
+attribute of your 6 heroes).
+
+Each row shows: the offset of its first byte, the encoded values (hexa), the decoded values (hexa),
+the decoded values (decimal) and the decoded values as characters.
+
+0x1cd 	0x3e 0x26 0x3f 0x34 0x25 0x77	0x4c 0x55 0x4b 0x41 0x53 0x00	 76  85  75  65  83   0	LUKAS.
+
+Every possible cell (256 values for each column) is formatted once, when the module is loaded.
+The rows are assembled from those tables and the whole dump is written with a single call.
+
+Instead of the whole file, the dump can be limited to the rows containing some offsets (ex: the modified
+ones) plus N rows of context before & after them. The non-contiguous groups of rows are separated by a
+'--' line.
+"""
+import bisect
+import sys
+
+from mc1 import timings
+from mc1.codec import xcode
+
+BLOCK_SIZE = 6  # When displaying the save-file, print BLOCK_SIZE cols/line. (6 because there are 6 heroes in the game)
+COLORED_START = "\033[1;36m"  # ASCII code used when displaying the modified bytes in color
+COLORED_END = "\033[1;m"  # ASCII code used when displaying the modified bytes in color
+
+# [optional] the file is not always aligned in blocks of 'BLOCK_SIZE', 'pad' can be used to inject a new line to make reading the file easier.
+# An underscore '_' char will be substituted as a padding character.
+# This makes the final result look more regular (as well as easier to parse and document)
+# Note that the pads below do not necessary make sense, on my test save-file they look good, but it
+# is possible that some fields thought to be unused or related, have in fact another meaning...
+# Content: the offsets that end a row (the next byte starts on a newline).
+PAD = frozenset({0x1cc, 0x1f1, 0x22c, 0x26f, 0x3a3, 0x430, 0x479})
+
+# The separators used when printing the save-file. They must change if the file is used as a CSV file
+SEP_GROUPS = '\t'
+SEP_COLS = ' '
+SEP_CHARS = ''
+# Output is a CSV file: we use tabs as separators, they are the only safe choice.
+# ',' or ';' cannot be used, they may appear in the 'chars' column, which would
+# break the import from the CSV. While Tabs cannot appear in the output.
+SEP_COLS_CSV = '\t'
+
+# The cells, for each one of the 256 possible byte values
+HEXA = tuple("{0:#04x}".format(val) for val in range(256))
+DECIMAL = tuple("{0:>3}".format(val) for val in range(256))
+# protection against special chars that create problems on the screen (beep, etc.)
+CHARS = tuple(c if c.isprintable() else "." for c in map(chr, range(256)))
+
+GROUP_SEPARATOR = "--"  # printed between 2 non-contiguous groups of rows
+
+# Used to pad the rows with less than BLOCK_SIZE values
+EMPTY_HEXA = "   _"
+EMPTY_DECIMAL = "  _"
+
+
+def _colored(cell):
+    return COLORED_START + cell + COLORED_END
+
+
+HEXA_COLORED = tuple(map(_colored, HEXA))
+DECIMAL_COLORED = tuple(map(_colored, DECIMAL))
+CHARS_COLORED = tuple(map(_colored, CHARS))
+
+
+def row_spans(length, pad=PAD):
+    """
+    Split a save-file in rows.
+    A row ends when BLOCK_SIZE bytes have been read, or a 'pad' offset is reached, or the end of file is reached.
+    :param length: length of the save-file
+    :param pad: offsets that end a row
+    :return: list of (start, end) offsets of the rows ('end' excluded)
+    """
+    spans = []
+    pads = sorted(p for p in pad if p < length)
+    next_pad = 0  # index (in 'pads') of the first pad located after the current row start
+    start = 0
+    while start < length:
+        end = min(start + BLOCK_SIZE, length)
+        while next_pad < len(pads) and pads[next_pad] < start:
+            next_pad += 1
+        if next_pad < len(pads) and pads[next_pad] < end:
+            end = pads[next_pad] + 1
+        spans.append((start, end))
+        start = end
+    return spans
+
+
+def rows_around(spans, offsets, context=0):
+    """
+    Select the rows that contain at least one of the offsets, plus 'context' rows before & after them.
+    :param spans: the (start, end) offsets of the rows (see row_spans())
+    :param offsets: the offsets to look for (ex: the modified ones)
+    :param context: number of rows displayed before & after a selected row
+    :return: list of groups (lists of contiguous spans)
+    """
+    starts = [start for start, _ in spans]
+    rows = sorted({bisect.bisect_right(starts, offset) - 1 for offset in offsets
+                   if spans and 0 <= offset < spans[-1][1]})
+
+    groups = []
+    first = last = None  # indexes of the first & last rows of the current group
+    for row in rows:
+        if last is not None and row - context <= last + 1:
+            last = max(last, row + context)
+            continue
+        if last is not None:
+            groups.append(spans[first:last + 1])
+        first, last = max(row - context, 0), row + context
+    if last is not None:
+        groups.append(spans[first:last + 1])
+    return groups
+
+
+def render_rows(data, decoded, spans, csv_friendly=False, highlight=None):
+    """
+    Format the rows of a save-file.
+    :param data: the (encoded) content of the save-file
+    :param decoded: the decoded content of the save-file
+    :param spans: the (start, end) offsets of the rows to format (see row_spans())
+    :param csv_friendly: if True, use a "tab" separator between all the values
+    :param highlight: set of offsets whose values are displayed with an ASCII color (None: no colors)
+    :return: list of lines (without the trailing newline)
+    """
+    sep_cols = SEP_COLS_CSV if csv_friendly else SEP_COLS
+    hexa = HEXA.__getitem__
+    decimal = DECIMAL.__getitem__
+    chars = CHARS.__getitem__
+    lines = []
+    for start, end in spans:
+        encoded_row = data[start:end]
+        decoded_row = decoded[start:end]
+        missing = BLOCK_SIZE - (end - start)
+
+        if highlight and not highlight.isdisjoint(range(start, end)):
+            group_encoded_hexa = []
+            group_decoded_hexa = []
+            group_decoded_decimal = []
+            group_chars = []
+            for offset, byte, val in zip(range(start, end), encoded_row, decoded_row):
+                if offset in highlight:
+                    group_encoded_hexa.append(HEXA_COLORED[byte])
+                    group_decoded_hexa.append(HEXA_COLORED[val])
+                    group_decoded_decimal.append(DECIMAL_COLORED[val])
+                    group_chars.append(CHARS_COLORED[val])
+                else:
+                    group_encoded_hexa.append(HEXA[byte])
+                    group_decoded_hexa.append(HEXA[val])
+                    group_decoded_decimal.append(DECIMAL[val])
+                    group_chars.append(CHARS[val])
+        else:
+            group_encoded_hexa = list(map(hexa, encoded_row))
+            group_decoded_hexa = list(map(hexa, decoded_row))
+            group_decoded_decimal = list(map(decimal, decoded_row))
+            group_chars = list(map(chars, decoded_row))
+
+        if missing:
+            group_encoded_hexa += [EMPTY_HEXA] * missing
+            group_decoded_hexa += [EMPTY_HEXA] * missing
+            group_decoded_decimal += [EMPTY_DECIMAL] * missing
+
+        lines.append(SEP_GROUPS.join(("{0:#05x}".format(start).ljust(6),
+                                      sep_cols.join(group_encoded_hexa),
+                                      sep_cols.join(group_decoded_hexa),
+                                      sep_cols.join(group_decoded_decimal),
+                                      SEP_CHARS.join(group_chars))))
+    return lines
+
+
+def render_dump(data, decoded=None, csv_friendly=False, highlight=None, pad=PAD, changes=None, context=0):
+    """
+    Format the content of a save-file.
+    :param data: the (encoded) content of the save-file (bytes, mmap...)
+    :param decoded: the decoded content, if it is already known (else it is computed)
+    :param csv_friendly: if True, use a "tab" separator between all the values
+    :param highlight: offsets whose values are displayed with an ASCII color (None: no colors)
+    :param pad: offsets that end a row
+    :param changes: if not None, only the rows containing those offsets are formatted (see rows_around())
+    :param context: number of rows displayed before & after the rows containing 'changes'
+    :return: the text of the dump
+    """
+    with timings.phase('decode'):
+        data = bytes(data)
+        if decoded is None:
+            decoded = xcode(data)
+    if highlight is not None and not isinstance(highlight, (set, frozenset)):
+        highlight = frozenset(highlight)
+
+    with timings.phase('format'):
+        spans = row_spans(len(data), pad)
+        if changes is None:
+            lines = render_rows(data, decoded, spans, csv_friendly, highlight)
+        else:
+            lines = []
+            for group in rows_around(spans, changes, context):
+                if lines:
+                    lines.append(GROUP_SEPARATOR)
+                lines += render_rows(data, decoded, group, csv_friendly, highlight)
+        if not lines:
+            return ''
+        return '\n'.join(lines) + '\n'
+
+
+def dump(data, decoded=None, csv_friendly=False, highlight=None, pad=PAD, changes=None, context=0, out=None):
+    """
+    Print the content of a save-file (see render_dump()), in a single write.
+    :param out: file where the dump is written (default: STDOUT)
+    """
+    text = render_dump(data, decoded, csv_friendly, highlight, pad, changes, context)
+    with timings.phase('print'):
+        (out or sys.stdout).write(text)
+    timings.count('chars_printed', len(text))
@@ -0,0 +1,275 @@
+"""
+The edit scripts of the save-file editor: one operation per line, applied in order to the decoded content.
+License: GPLv3
+
+Operations (offsets in hexa, the other numbers in decimal, '#' starts a comment):
+  0x1A3 12 70 50 1           the decoded bytes from 0x1A3 become 12, 70, 50, 1 (the original format, see mc1/patch.py)
+  fill 0x1A3 16 0            the 16 bytes from 0x1A3 become 0
+  copy 0x1A3 0x200 16        the 16 bytes from 0x1A3 become the 16 bytes from 0x200 (as modified by the previous lines)
+  copy 0x1A3 0x200 16 X.MCS  same, the 16 bytes being read from another save-file (its decoded content)
+  heroes 0x0 30              the 6 heroes' bytes from 0x0 (a column of 6 values, see mc1/schema.py) become 30
+  heroes 0x0 30 25 25 20 30 28   one value per hero
+  heroes gold 5000           same with a named field (see HERO_FIELDS in mc1/schema.py), ex: 2 bytes per hero for 'gold'
+  text 0x47A "CASTLE      "  the bytes from 0x47A become the characters (the quotes are optional, except to keep spaces)
+  name 1 LUKAS               the name of the 1st hero (1-6) becomes LUKAS, its length is modified too
+
+The script is consumed line by line (it is never loaded whole: a file object or sys.stdin is read by chunks),
+every operation is written in a decoded copy of the save-file, and the modified bytes are marked in a mask.
+At the end, the marked bytes give the runs of the editor (see coalesce() in mc1/patch.py), which are encoded
+in bulk. An invalid line cancels the whole script (PatchError, with the line number): the save-file is not
+touched before the whole script is applied.
+
+The batch editor compiles the script once for all its save-files (see compile_script()).
+"""
+import re
+
+from mc1 import timings
+from mc1.codec import xcode
+from mc1.patch import PatchError, check_bounds, parse_edit
+from mc1.schema import HERO_COUNT, HERO_FIELDS, encode_value
+
+_FIELDS = {field.name: field for field in HERO_FIELDS}
+_NAME = _FIELDS['name']
+_NAME_LENGTH = _FIELDS['name_length']
+_MODIFIED = re.compile(b'[^\x00]+')  # the runs of modified bytes in the mask
+
+
+def _offset(word):
+    try:
+        offset = int(word, 16)
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise PatchError("Invalid offset (%s)" % word)
+    return offset
+
+
+def _number(word, what='value', maximum=255):
+    try:
+        number = int(word)
+    except ValueError:
+        number = -1
+    if not 0 <= number <= maximum:
+        raise PatchError("Invalid %s (%s)" % (what, word))
+    return number
+
+
+def _text(words, line):
+    """
+    The characters of a 'text' or 'name' operation: the end of the line (quotes are removed).
+    """
+    if isinstance(line, str):
+        text = line.split(None, 2)[2].rstrip('\r\n') if len(words) > 2 else ''
+    else:
+        text = ' '.join(words[2:])
+    if len(text) > 1 and text[0] == text[-1] and text[0] in '"\'':
+        text = text[1:-1]
+    return text
+
+
+class EditScript:
+    """
+    Apply an edit script to the content of a save-file.
+    Ex: script = EditScript(data)
+        script.feed(sys.stdin)
+        modified = apply_runs(data, script.runs())
+    """
+
+    def __init__(self, data):
+        """
+        :param data: the (encoded) content of the save-file
+        """
+        self.decoded = bytearray(xcode(data))
+        self.mask = bytearray(len(data))  # 1 for each modified byte
+        self.lines = 0  # number of lines read
+        self._sources = {}  # decoded contents of the other save-files (copy)
+
+    def write(self, offset, values):
+        """
+        Write decoded values (checked against the length of the save-file).
+        """
+        end = offset + len(values)
+        if end > len(self.decoded):
+            raise PatchError("The offsets (%s-%s) are bigger than the length of the file (%s)! Please check them."
+                             % (hex(offset), hex(end - 1), hex(len(self.decoded))))
+        self.decoded[offset:end] = values
+        self.mask[offset:end] = b'\x01' * len(values)
+
+    def feed(self, lines):
+        """
+        Apply the lines of the script, in order.
+        :param lines: iterable of strings ('0x1A3 12 70') or of lists of strings (['0x1A3', '12', '70'])
+        """
+        with timings.phase('parse'):
+            self._feed(lines)
+        return self
+
+    def _feed(self, lines):
+        length = len(self.decoded)
+        start = self.lines
+        for line in lines:
+            self.lines += 1
+            words = line.split() if isinstance(line, str) else line
+            if len(words) < 2 or words[0][0] == '#':
+                continue
+            operation = _OPERATIONS.get(words[0])
+            try:
+                if operation is None:  # the original format (the most common line: decoded inline)
+                    offset = int(words[0], 16)
+                    values = bytes(map(int, words[1:]))
+                    if offset < 0 or offset + len(values) > length:
+                        raise ValueError
+                    self.decoded[offset:offset + len(values)] = values
+                    self.mask[offset:offset + len(values)] = b'\x01' * len(values)
+                else:
+                    getattr(self, operation)(words, line)
+            except ValueError as e:
+                if operation is None and not isinstance(e, PatchError):
+                    try:
+                        parse_edit(words, length)  # the usual error messages
+                    except PatchError as error:
+                        e = error
+                raise PatchError("Line %d of the edit script: %s" % (self.lines, e))
+        timings.count('script_lines', self.lines - start)
+
+    def runs(self):
+        """
+        :return: the modified decoded bytes, as sorted runs: list of (offset, decoded values as bytes)
+        """
+        with timings.phase('merge'):
+            return [(match.start(), bytes(self.decoded[match.start():match.end()]))
+                    for match in _MODIFIED.finditer(self.mask)]
+
+    def _fill(self, words, line):
+        if len(words) != 4:
+            raise PatchError("Expected: fill OFFSET COUNT VALUE")
+        self.write(_offset(words[1]), bytes([_number(words[3])]) * _number(words[2], 'count', len(self.decoded)))
+
+    def _copy(self, words, line):
+        if len(words) not in (4, 5):
+            raise PatchError("Expected: copy OFFSET SOURCE_OFFSET COUNT [SAVEFILE]")
+        source, count = _offset(words[2]), _number(words[3], 'count', len(self.decoded))
+        decoded = self._source(words[4]) if len(words) == 5 else self.decoded
+        if source + count > len(decoded):
+            raise PatchError("The source offsets (%s-%s) are bigger than the length of the file (%s)"
+                             % (hex(source), hex(source + count - 1), hex(len(decoded))))
+        self.write(_offset(words[1]), bytes(decoded[source:source + count]))
+
+    def _source(self, savefile):
+        if savefile not in self._sources:
+            try:
+                with open(savefile, 'rb') as f:
+                    self._sources[savefile] = xcode(f.read())
+            except OSError as e:
+                raise PatchError("Cannot read %s (%s)" % (savefile, e.strerror))
+        return self._sources[savefile]
+
+    def _heroes(self, words, line):
+        values = words[2:]
+        if len(values) not in (1, HERO_COUNT):
+            raise PatchError("Expected: heroes OFFSET|FIELD VALUE (all the heroes) or %d VALUES (one per hero)"
+                             % HERO_COUNT)
+        if len(values) == 1:
+            values = values * HERO_COUNT
+        field = _FIELDS.get(words[1])
+        if field is None:  # an offset: one byte per hero
+            self.write(_offset(words[1]), bytes(_number(value) for value in values))
+        elif field.type == 'str':
+            raise PatchError("Use 'name HERO TEXT' for the names")
+        else:
+            for hero, value in enumerate(values):
+                self.write(field.offset + hero * field.stride, encode_value(field, _number(value, maximum=0xFFFF)))
+
+    def _text_op(self, words, line):
+        self.write(_offset(words[1]), _text(words, line).encode('latin-1'))
+
+    def _name(self, words, line):
+        hero = _number(words[1], 'hero', HERO_COUNT) - 1
+        if hero < 0:
+            raise PatchError("Invalid hero (%s): 1-%d" % (words[1], HERO_COUNT))
+        name = _text(words, line)
+        self.write(_NAME.offset + hero * _NAME.stride, encode_value(_NAME, name))
+        self.write(_NAME_LENGTH.offset + hero * _NAME_LENGTH.stride, bytes([len(name)]))
+
+
+_OPERATIONS = {
+    'fill': '_fill',
+    'copy': '_copy',
+    'heroes': '_heroes',
+    'text': '_text_op',
+    'name': '_name',
+}
+
+
+class _Compiler(EditScript):
+    """
+    Apply an edit script to a blank save-file, the copies inside the save-file (content-dependent) are kept as
+    steps (see compile_script()).
+    """
+
+    def __init__(self, length):
+        super().__init__(bytes(length))
+        self.steps = []
+
+    def _copy(self, words, line):
+        if len(words) != 4:  # from another save-file: the same for all the save-files
+            return super()._copy(words, line)
+        target, source, count = _offset(words[1]), _offset(words[2]), _number(words[3], 'count', len(self.decoded))
+        check_bounds([(source, bytes(count)), (target, bytes(count))], len(self.decoded))
+        self.steps += [self.runs(), (target, source, count)]
+        self.mask = bytearray(len(self.mask))
+
+
+class CompiledScript:
+    """
+    An edit script compiled once, then applied to many save-files (see compile_script()).
+    """
+
+    def __init__(self, steps):
+        self.steps = steps  # runs (list of (offset, decoded values)) and copies (target, source, count), in order
+
+    def runs(self, data):
+        """
+        :param data: the (encoded) content of a save-file
+        :return: the modified decoded bytes of this save-file, as sorted runs (see EditScript.runs())
+        """
+        if len(self.steps) == 1:  # no copy inside the save-file: the same runs for all the save-files
+            check_bounds(self.steps[0], len(data))
+            return self.steps[0]
+        decoded = bytearray(xcode(data))
+        mask = bytearray(len(data))
+        for step in self.steps:
+            if isinstance(step, tuple):
+                target, source, count = step
+                check_bounds([(source, bytes(count)), (target, bytes(count))], len(data))
+                decoded[target:target + count] = decoded[source:source + count]
+                mask[target:target + count] = b'\x01' * count
+            else:
+                check_bounds(step, len(data))
+                for offset, values in step:
+                    decoded[offset:offset + len(values)] = values
+                    mask[offset:offset + len(values)] = b'\x01' * len(values)
+        return [(match.start(), bytes(decoded[match.start():match.end()])) for match in _MODIFIED.finditer(mask)]
+
+
+def compile_script(lines, length):
+    """
+    Compile an edit script for many save-files (see mc1/batch.py): the script is parsed & applied once, to a blank
+    save-file. Only the copies inside the save-file ('copy' without SAVEFILE) depend on the content of each
+    save-file: they are replayed on each save-file, between the runs of the other lines (CompiledScript.runs()).
+    :param lines: the lines of the script (iterable)
+    :param length: the maximum length of the save-files (a line out of it is an error of the script)
+    :return: CompiledScript
+    """
+    compiler = _Compiler(length).feed(lines)
+    return CompiledScript(compiler.steps + [compiler.runs()])
+
+
+def run_script(data, lines):
+    """
+    Apply an edit script to the content of a save-file (see EditScript).
+    :param data: the (encoded) content of the save-file
+    :param lines: the lines of the script (iterable)
+    :return: the modified decoded bytes, as sorted runs: list of (offset, decoded values as bytes)
+    """
+    return EditScript(data).feed(lines).runs()
@@ -0,0 +1,178 @@
+"""
+Export many decoded Magic Candle 1 save-files as a single table.
+License: GPLv3
+
+One row per save-file, the columns being either:
+- 'bytes': one column per offset (the decoded byte values), the save-files of another length than the first
+  one are skipped (with a warning),
+- 'fields': one column per named field (see mc1/schema.py).
+
+Formats:
+- csv: "tab" separated values (as --csv-friendly), the first column is the name of the save-file,
+- jsonl: one JSON object per save-file ({"file": ..., "values": [...]} or {"file": ..., <field>: <value>, ...}),
+- npy: NumPy matrix (uint8, rows x offsets), only for the 'bytes' columns. The names of the save-files
+  are written in a joined text file (<output>.files.txt), one per row.
+
+The files are decoded & written one by one (in chunks of rows), so the memory use does not depend on the
+number of save-files. The .npy file is written without NumPy: its header is rewritten once the number of rows is known.
+"""
+import csv
+import json
+import os
+import struct
+
+from mc1.codec import xcode
+from mc1.schema import COLUMNS, decode_row
+
+FORMATS = ('csv', 'jsonl', 'npy')
+CHUNK_ROWS = 256  # number of rows written at once
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEADER_SIZE = 128  # fixed size (multiple of 64), so that the header can be rewritten in place
+
+
+def find_savefiles(root, extension='.MCS'):
+    """
+    Find all the save-files of a directory tree (the extension is not case sensitive).
+    :return: sorted list of file names
+    """
+    if os.path.isfile(root):
+        return [root]
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        found += [os.path.join(dirpath, name) for name in sorted(filenames) if name.upper().endswith(extension.upper())]
+    return found
+
+
+def iter_decoded(savefiles):
+    """
+    :return: generator of (file name, decoded content)
+    """
+    for savefile in savefiles:
+        with open(savefile, 'rb') as f:
+            yield savefile, xcode(f.read())
+
+
+def _npy_header(rows, cols):
+    header = "{'descr': '|u1', 'fortran_order': False, 'shape': (%d, %d), }" % (rows, cols)
+    header = header.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin-1')
+
+
+def export_npy(savefiles, output, warn=print):
+    """
+    Write the decoded bytes of the save-files as a .npy matrix (one row per save-file).
+    All the rows must have the same length (the one of the first save-file), the other files are skipped.
+    :return: number of rows written
+    """
+    rows = 0
+    length = None
+    with open(output, 'wb') as out, open(output + '.files.txt', 'w') as names:
+        out.write(_npy_header(0, 0))
+        chunk = []
+        for savefile, decoded in iter_decoded(savefiles):
+            if length is None:
+                length = len(decoded)
+            if len(decoded) != length:
+                warn("WARNING: %s skipped (%s bytes, %s expected)" % (savefile, hex(len(decoded)), hex(length)))
+                continue
+            chunk.append(decoded)
+            names.write(savefile + '\n')
+            rows += 1
+            if len(chunk) >= CHUNK_ROWS:
+                out.write(b''.join(chunk))
+                chunk = []
+        out.write(b''.join(chunk))
+        out.seek(0)
+        out.write(_npy_header(rows, length or 0))
+    return rows
+
+
+def _rows(savefiles, columns, warn):
+    """
+    :return: generator of (file name, tuple of values), the save-files too short for the fields are skipped.
+    For the 'bytes' columns, all the rows have the length of the first save-file (as export_npy()).
+    """
+    length = None
+    for savefile, decoded in iter_decoded(savefiles):
+        if columns == 'fields':
+            try:
+                yield savefile, decode_row(decoded)
+            except ValueError as e:
+                warn("WARNING: %s skipped (%s)" % (savefile, e))
+        else:
+            if length is None:
+                length = len(decoded)
+            if len(decoded) != length:
+                warn("WARNING: %s skipped (%s bytes, %s expected)" % (savefile, hex(len(decoded)), hex(length)))
+                continue
+            yield savefile, tuple(decoded)
+
+
+def export_csv(savefiles, output, columns='bytes', warn=print):
+    """
+    Write the save-files as a "tab" separated table. The header gives the offsets (hexa) or the field names.
+    :return: number of rows written
+    """
+    rows = 0
+    with open(output, 'w', newline='') as out:
+        writer = csv.writer(out, delimiter='\t', lineterminator='\n')
+        header = None
+        chunk = []
+        for savefile, values in _rows(savefiles, columns, warn):
+            if header is None:
+                header = COLUMNS if columns == 'fields' else tuple("{0:#05x}".format(i) for i in range(len(values)))
+                writer.writerow(('file',) + header)
+            chunk.append((savefile,) + values)
+            rows += 1
+            if len(chunk) >= CHUNK_ROWS:
+                writer.writerows(chunk)
+                chunk = []
+        writer.writerows(chunk)
+    return rows
+
+
+def export_jsonl(savefiles, output, columns='bytes', warn=print):
+    """
+    Write the save-files as JSON lines (one object per save-file).
+    :return: number of rows written
+    """
+    rows = 0
+    with open(output, 'w') as out:
+        chunk = []
+        for savefile, values in _rows(savefiles, columns, warn):
+            if columns == 'fields':
+                record = {'file': savefile}
+                record.update(zip(COLUMNS, values))
+            else:
+                record = {'file': savefile, 'values': values}
+            chunk.append(json.dumps(record))
+            rows += 1
+            if len(chunk) >= CHUNK_ROWS:
+                out.write('\n'.join(chunk) + '\n')
+                chunk = []
+        if chunk:
+            out.write('\n'.join(chunk) + '\n')
+    return rows
+
+
+def export(savefiles, output, fmt='csv', columns='bytes', warn=print):
+    """
+    Export the save-files (see the module documentation).
+    :param savefiles: list of save-file names
+    :param output: name of the output file
+    :param fmt: 'csv', 'jsonl' or 'npy'
+    :param columns: 'bytes' or 'fields'
+    :return: number of rows written
+    """
+    if fmt == 'npy':
+        if columns != 'bytes':
+            raise ValueError("The npy format only supports the 'bytes' columns")
+        return export_npy(savefiles, output, warn)
+    if fmt == 'jsonl':
+        return export_jsonl(savefiles, output, columns, warn)
+    if fmt == 'csv':
+        return export_csv(savefiles, output, columns, warn)
+    raise ValueError("Unknown format: %s (%s)" % (fmt, ', '.join(FORMATS)))
+
@@ -0,0 +1,218 @@
+"""
+Extract all the Tile files of a directory (<game directory>/TILES/) as PNG files, incrementally.
+License: GPLv3
+
+The Tile files are extracted by a pool of processes (one Tile file per task): one PNG per tile
+(<EGAxx.TIL>__NN.png, as mc1_extract_tiles.py), or one atlas per Tile file (<EGAxx.TIL>__atlas.png & .json).
+
+A manifest (MANIFEST_NAME, in the output directory) keeps, for each Tile file (by its path relative to the output
+directory: the Tile files of several directories can share an output directory): the SHA-1 of its content, its size &
+mtime, the extraction options and the names of the generated files. On the next runs, a Tile file is skipped when
+its size & mtime did not change (or its content did not change: the SHA-1 is only computed when the size or the mtime
+changed), the options are the same and its generated files still exist. When a Tile file is extracted again, its
+previous files which are not generated anymore (ex: fewer tiles, or an atlas instead of one PNG per tile) are removed.
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import time
+
+from mc1 import timings
+from mc1.patch import write_atomic
+from mc1.tiles import TileFile, save_atlas, save_png, tile_image
+
+EXTENSION = '.TIL'
+MANIFEST_NAME = 'tiles_manifest.json'
+
+
+def find_tilefiles(directory):
+    """
+    :return: sorted list of the names of the Tile files of the directory (the extension is not case sensitive)
+    """
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.upper().endswith(EXTENSION) and os.path.isfile(os.path.join(directory, name)))
+
+
+def file_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_manifest(filename):
+    """
+    :return: dict Tile file name (without directory) => entry (empty if there is no manifest yet, or if it is unreadable)
+    """
+    try:
+        with open(filename) as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_manifest(filename, entries):
+    write_atomic(filename, json.dumps({'files': entries}, indent=1, sort_keys=True).encode())
+
+
+def extract_tilefile(tilefile, out_dir, scale_factor=2, atlas=False, columns=16):
+    """
+    Write the PNG files of one Tile file.
+    :param tilefile: name of the Tile file
+    :param out_dir: directory of the PNG files
+    :param scale_factor: the images are scaled
+    :param atlas: one atlas (& its JSON index) instead of one PNG per tile
+    :param columns: number of tiles per row of the atlas
+    :return: (tilefile, names of the generated files (without directory), error message or None, elapsed seconds)
+    """
+    start = time.perf_counter()
+    base = os.path.join(out_dir, os.path.basename(tilefile))
+    outputs = []
+    try:
+        with TileFile(tilefile) as tile_file:
+            tiles_pixels = tile_file.tiles()
+            if atlas:
+                save_atlas(base + '__atlas.png', [(tilefile, tile_file.offsets, tiles_pixels)], columns, scale_factor)
+                outputs = [base + '__atlas.png', base + '__atlas.json']
+            else:
+                for num_tile, tile_pixels in enumerate(tiles_pixels):
+                    name = "{0}__{1:02}.png".format(base, num_tile)
+                    save_png(tile_image(tile_pixels, scale_factor), name)
+                    outputs.append(name)
+        error = None
+    except (OSError, ValueError, IndexError) as e:
+        error = str(e)
+    return tilefile, [os.path.basename(name) for name in outputs], error, time.perf_counter() - start
+
+
+def _extract_worker(task):
+    """
+    :return: (tilefile, SHA-1, (size, mtime) of the Tile file before its extraction, outputs, error, elapsed seconds)
+    """
+    tilefile = task[0]
+    try:
+        st = os.stat(tilefile)
+        sha1 = file_hash(tilefile)
+    except OSError as e:
+        return tilefile, None, None, [], str(e), 0.0
+    _, outputs, error, elapsed = extract_tilefile(*task)
+    return tilefile, sha1, (st.st_size, st.st_mtime_ns), outputs, error, elapsed
+
+
+def _extract_all(tasks, jobs):
+    """
+    :return: generator of the results of _extract_worker(), as soon as they are available
+    """
+    if jobs == 1 or len(tasks) <= 1:  # (the files are counted by mc1.tiles, see mc1/timings.py)
+        yield from map(_extract_worker, tasks)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_extract_worker, task): task for task in tasks}
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            _count_files(futures[future][1], result)
+            yield result
+
+
+def _count_files(out_dir, result):
+    """
+    Count the files read & written by a process of the pool (its timings are not measured).
+    """
+    tilefile, sha1, stat, outputs, error, elapsed = result
+    if stat:
+        timings.count('files_read')
+        timings.count('bytes_read', stat[0])
+    for name in outputs:
+        timings.count_file(os.path.join(out_dir, name))
+
+
+def _is_up_to_date(entry, options, out_dir):
+    return (bool(entry) and entry.get('options') == options
+            and all(os.path.exists(os.path.join(out_dir, name)) for name in entry.get('outputs', ())))
+
+
+def _remove_stale(out_dir, entry, outputs):
+    """
+    Remove the files of the previous extraction of a Tile file (its manifest entry) which are not in 'outputs'.
+    """
+    if not entry:
+        return
+    for name in set(entry.get('outputs', ())).difference(outputs):
+        try:
+            os.remove(os.path.join(out_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+def _manifest_key(tilefile, out_dir):
+    """
+    :return: the key of a Tile file in the manifest of 'out_dir': its path relative to 'out_dir' (the Tile files of
+    several directories extracted in the same output directory do not collide)
+    """
+    return os.path.relpath(os.path.abspath(tilefile), os.path.abspath(out_dir))
+
+
+def _owner(key, out_dir):
+    """
+    :return: the (absolute) directory of the Tile file of a manifest key
+    """
+    return os.path.dirname(os.path.normpath(os.path.join(os.path.abspath(out_dir), key)))
+
+
+def extract_directories(directories, out_dir=None, scale_factor=2, atlas=False, columns=16, jobs=None, force=False):
+    """
+    Extract the Tile files of the directories which changed since the last run, in a pool of processes.
+    :param directories: the directories of the Tile files
+    :param out_dir: the directory of the PNG files & of the manifest (default: the directory of each Tile file)
+    :param jobs: number of processes (default: number of CPUs). 1: no pool, everything is done in this process
+    :param force: extract all the Tile files, even the ones which did not change
+    :return: generator of (tilefile, status ('extracted', 'skipped' or 'error'), number of generated files,
+             error message or None, elapsed seconds), the skipped Tile files first. The manifests are written at the
+             end, once per output directory (the entries of the directories which are not extracted are kept).
+    """
+    options = {'scale': scale_factor, 'atlas': atlas, 'columns': columns if atlas else None}
+    extracted = {os.path.abspath(directory) for directory in directories}
+    manifests = {}  # output directory => (name of the manifest, previous entries, new entries)
+    outs = {}  # Tile file => output directory
+    tasks = []
+    for directory in directories:
+        out = out_dir or directory
+        if out not in manifests:
+            os.makedirs(out, exist_ok=True)
+            manifest_name = os.path.join(out, MANIFEST_NAME)
+            manifest = load_manifest(manifest_name)
+            manifests[out] = (manifest_name, manifest,
+                              {key: entry for key, entry in manifest.items() if _owner(key, out) not in extracted})
+        manifest, entries = manifests[out][1:]
+        for tilefile in find_tilefiles(directory):
+            start = time.perf_counter()
+            key = _manifest_key(tilefile, out)
+            st = os.stat(tilefile)
+            entry = manifest.get(key)
+            if not force and _is_up_to_date(entry, options, out):
+                if (entry.get('size'), entry.get('mtime_ns')) == (st.st_size, st.st_mtime_ns):
+                    entries[key] = entry
+                elif entry.get('sha1') == file_hash(tilefile):  # touched, but the same content
+                    entries[key] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            if key in entries:
+                yield tilefile, 'skipped', len(entries[key]['outputs']), None, time.perf_counter() - start
+            else:
+                outs[tilefile] = out
+                tasks.append((tilefile, out, scale_factor, atlas, columns))
+
+    try:
+        for tilefile, sha1, stat, outputs, error, elapsed in _extract_all(tasks, jobs):
+            if error:
+                yield tilefile, 'error', 0, error, elapsed
+                continue
+            out = outs[tilefile]
+            manifest, entries = manifests[out][1:]
+            key = _manifest_key(tilefile, out)
+            _remove_stale(out, manifest.get(key), outputs)
+            entries[key] = {'sha1': sha1, 'size': stat[0], 'mtime_ns': stat[1], 'options': options,
+                            'outputs': outputs}
+            yield tilefile, 'extracted', len(outputs), None, elapsed
+    finally:
+        # the Tile files which are not extracted (errors, interrupted run) are not kept: they are extracted next time
+        for manifest_name, manifest, entries in manifests.values():
+            if entries != manifest:
+                save_manifest(manifest_name, entries)
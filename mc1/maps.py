@@ -0,0 +1,102 @@
+"""
+Render "The Magic Candle 1" maps: a map is simply a grid of tiles.
+License: GPLv3
+
+The map files of the game are not decoded yet (they also contain game data: texts, scripted actions...),
+so the grid of tile numbers is read either from a text file (one row of the map per line, tile numbers
+separated by spaces, '.' or -1 for an empty cell), or from a raw file where each byte is the tile number
+of a cell (row by row, 'width' cells per row, after 'skip' bytes: the layout of the map which could be decoded).
+
+The tiles are decoded once (see mc1/tiles.py), then the whole map (or a region of it) is composed in a single
+NumPy operation: the (rows, cols) grid selects a (rows, cols, 14, 16) array of tiles, which is reordered as
+a (rows * 14, cols * 16) canvas of EGA color numbers.
+"""
+import numpy as np
+
+from mc1.tiles import TILE_HEIGHT, TILE_WIDTH
+
+EMPTY = -1  # empty cell of the grid (rendered in black)
+
+
+def read_grid_text(lines):
+    """
+    :param lines: the lines of the text file (one row of the map per line)
+    :return: NumPy array (rows, cols) of tile numbers (EMPTY for an empty cell, or to complete a short row)
+    """
+    rows = []
+    for num_line, line in enumerate(lines):
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        try:
+            rows.append([EMPTY if word == '.' else int(word, 0) for word in line.split()])
+        except ValueError:
+            raise ValueError("Line %s: invalid tile number: %s" % (num_line + 1, line))
+    grid = np.full((len(rows), max((len(row) for row in rows), default=0)), EMPTY, dtype=np.int32)
+    for num_row, row in enumerate(rows):
+        grid[num_row, :len(row)] = row
+    return grid
+
+
+def read_grid_raw(data, width, skip=0, height=None):
+    """
+    :param data: content of the raw map file
+    :param width: number of cells per row
+    :param skip: number of bytes before the grid (header)
+    :param height: number of rows (default: as many full rows as possible)
+    :return: NumPy array (rows, cols) of tile numbers
+    """
+    if width < 1:
+        raise ValueError("The width of the map must be positive")
+    cells = np.frombuffer(data, dtype=np.uint8)[skip:]
+    rows = len(cells) // width if height is None else height
+    if rows * width > len(cells):
+        raise ValueError("The map is too short for %s rows of %s cells" % (rows, width))
+    return cells[:rows * width].reshape(rows, width).astype(np.int32)
+
+
+def tiles_region(region, grid_shape):
+    """
+    Tiles of the grid covering a region.
+    :param region: (column, row, columns, rows) in tiles, or None (the whole map)
+    :return: (row slice, column slice) of the grid
+    """
+    if region is None:
+        return slice(0, grid_shape[0]), slice(0, grid_shape[1])
+    col, row, cols, rows = region
+    if cols < 1 or rows < 1 or not (0 <= col < grid_shape[1] and 0 <= row < grid_shape[0]):
+        raise ValueError("The region %s is outside the map (%s x %s tiles)" % (region, grid_shape[1], grid_shape[0]))
+    return slice(row, min(row + rows, grid_shape[0])), slice(col, min(col + cols, grid_shape[1]))
+
+
+def render_map(grid, tiles, region=None, viewport=None):
+    """
+    Compose the map (or a part of it).
+    :param grid: NumPy array (rows, cols) of tile numbers (EMPTY: black cell)
+    :param tiles: the decoded tiles, NumPy array (tiles, TILE_HEIGHT, TILE_WIDTH) (see mc1.tiles.decode_tiles())
+    :param region: (column, row, columns, rows) in tiles: only this part of the map is rendered
+    :param viewport: (x, y, width, height) in pixels (unscaled): only this part of the map is rendered
+    :return: NumPy array (height, width) of EGA color numbers
+    """
+    if viewport is not None:  # the tiles covering the viewport are rendered, then the canvas is cropped
+        x, y, width, height = viewport
+        if width < 1 or height < 1 or x < 0 or y < 0:
+            raise ValueError("Invalid viewport: %s" % (viewport,))
+        col, row = x // TILE_WIDTH, y // TILE_HEIGHT
+        cols, rows = -(-(x + width) // TILE_WIDTH) - col, -(-(y + height) // TILE_HEIGHT) - row
+        canvas = render_map(grid, tiles, (col, row, cols, rows))
+        return canvas[y - row * TILE_HEIGHT:y - row * TILE_HEIGHT + height,
+                      x - col * TILE_WIDTH:x - col * TILE_WIDTH + width]
+
+    rows_slice, cols_slice = tiles_region(region, grid.shape)
+    cells = grid[rows_slice, cols_slice]
+    invalid = (cells >= len(tiles)) | (cells < EMPTY)
+    if invalid.any():
+        row, col = np.argwhere(invalid)[0]
+        raise ValueError("Unknown tile %s at (%s, %s), the tile set has %s tiles" % (
+            cells[row, col], cols_slice.start + col, rows_slice.start + row, len(tiles)))
+
+    # the black tile (for the empty cells) is added at the end of the tile set: EMPTY (-1) selects it
+    tile_set = np.concatenate([tiles, np.zeros((1, TILE_HEIGHT, TILE_WIDTH), dtype=np.uint8)])
+    rows, cols = cells.shape
+    return tile_set[cells].transpose(0, 2, 1, 3).reshape(rows * TILE_HEIGHT, cols * TILE_WIDTH)
@@ -0,0 +1,179 @@
+"""
+Modify the byte values of a Magic Candle 1 save-file.
+License: GPLv3
+
+The modifications are given as lines of offset/values (the offset in hexa, the values in decimal):
+0x1A3 12 70 50 1
+=> the decoded byte at 0x1A3 becomes 12, the one at 0x1A4 becomes 70, etc.
+
+The modifications are handled as a transaction:
+- all the lines are parsed & checked (values, bounds) before the save-file is touched,
+  a single invalid line cancels the whole modification (PatchError),
+- the modified bytes are merged in contiguous runs, which are encoded in bulk (see mc1/codec.py),
+- the result is written in a temporary file, which replaces the target file (os.replace) once complete:
+  the target file is either left untouched, or completely modified, never half-modified.
+"""
+import os
+import shutil
+import tempfile
+
+from mc1 import timings
+from mc1.codec import xcode
+
+
+class PatchError(ValueError):
+    """
+    An invalid modification (bad offset or value, out of the save-file, etc.)
+    """
+
+
+def parse_edit(words, length=None):
+    """
+    Parse one modification: an offset (hexa) followed by the new decoded values (decimal, 0-255).
+    :param words: list of strings, ex: ['0x1A3', '12', '70']
+    :param length: length of the save-file (if given, the modification must fit inside the save-file)
+    :return: (offset, values as bytes)
+    """
+    try:
+        offset = int(words[0], 16)
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise PatchError("Invalid offset (%s) in the line (%s)" % (words[0], ' '.join(words)))
+    try:
+        values = bytes(int(value) for value in words[1:])
+    except ValueError:
+        raise PatchError("Invalid value (only 0-255 values are allowed) in the line (%s)" % ' '.join(words))
+    if length is not None and offset + len(values) > length:
+        raise PatchError("The offsets from this line (%s) are bigger than the length of the file (%s)! Please check them."
+                         % (' '.join(words), hex(length)))
+    return offset, values
+
+
+def check_bounds(edits, length):
+    """
+    Check that all the modifications fit inside a save-file of the given length.
+    """
+    for offset, values in edits:
+        if offset + len(values) > length:
+            raise PatchError("The offsets from this modification (%s, %d values) are bigger than the length of the file (%s)! Please check them."
+                             % (hex(offset), len(values), hex(length)))
+
+
+def coalesce(edits):
+    """
+    Merge the modifications in contiguous runs of decoded bytes.
+    When several modifications change the same byte, the last one wins (as if they were applied in order).
+    :param edits: list of (offset, values as bytes)
+    :return: sorted list of (offset, values as bytes), the runs neither overlap nor touch each other
+    """
+    runs = []
+    ordered = sorted(range(len(edits)), key=lambda i: edits[i][0])
+    group = []  # indexes of the modifications of the current run
+    run_start = run_end = None
+    for i in ordered:
+        offset, values = edits[i]
+        if not values:
+            continue
+        if run_end is not None and offset <= run_end:
+            group.append(i)
+            run_end = max(run_end, offset + len(values))
+            continue
+        if group:
+            runs.append(_merge(edits, group, run_start, run_end))
+        group = [i]
+        run_start, run_end = offset, offset + len(values)
+    if group:
+        runs.append(_merge(edits, group, run_start, run_end))
+    return runs
+
+
+def _merge(edits, group, run_start, run_end):
+    """
+    Build one run from the (overlapping or contiguous) modifications, applied in their original order.
+    """
+    run = bytearray(run_end - run_start)
+    for i in sorted(group):
+        offset, values = edits[i]
+        run[offset - run_start:offset - run_start + len(values)] = values
+    return run_start, bytes(run)
+
+
+def apply_runs(data, runs):
+    """
+    Apply the runs of decoded bytes (see coalesce()) to the encoded content of a save-file.
+    :param data: the (encoded) content of the save-file
+    :param runs: sorted list of (offset, decoded values)
+    :return: the modified (encoded) content, as a bytearray
+    """
+    with timings.phase('encode'):
+        patched = bytearray(data)
+        for offset, values in runs:
+            patched[offset:offset + len(values)] = xcode(values, offset)  # the values are encoded in bulk
+    return patched
+
+
+def modified_offsets(runs):
+    """
+    :return: the set of the offsets modified by the runs
+    """
+    offsets = set()
+    for offset, values in runs:
+        offsets.update(range(offset, offset + len(values)))
+    return offsets
+
+
+def write_atomic(filename, data, mode_from=None):
+    """
+    Write the whole content of a file in a single write, in a temporary file which then replaces the file.
+    If anything fails, the file is left untouched.
+    :param filename: name of the file to (re)write
+    :param data: the new content of the file
+    :param mode_from: name of a file whose permissions are given to the new file (default: 'filename', if it exists)
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    with timings.phase('write'):
+        fd, tmp_name = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filename) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            mode_from = mode_from or filename
+            if os.path.exists(mode_from):
+                shutil.copymode(mode_from, tmp_name)
+            else:  # a new file: the usual permissions (mkstemp() only gives access to the owner)
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp_name, 0o666 & ~umask)
+            os.replace(tmp_name, filename)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+    timings.count_file(filename)
+
+
+def save_patched(savefile, data, out=None, original=None, runs=None):
+    """
+    Write a modified save-file: either in a new file ('out'), or directly in the save-file (the modification is
+    first recorded in the history of the save-file, so that it can be undone, see mc1/backups.py).
+    A save-file without modifications is not touched (no write, no new version in its history).
+    :param savefile: name of the original save-file
+    :param data: the modified (encoded) content
+    :param out: name of the new save-file (None: the save-file is modified)
+    :param original: the current content of the save-file, if already read
+    :param runs: the runs applied to the save-file (see apply_runs()), if known: stored as is in its history
+    """
+    if out:
+        write_atomic(out, data, mode_from=savefile)
+    else:
+        from mc1.backups import record  # (mc1.backups uses write_atomic())
+        if original is None:
+            with open(savefile, 'rb') as f:
+                original = f.read()
+        if data == original:
+            return
+        with timings.phase('backup'):
+            record(savefile, original, data, runs=runs)
+        write_atomic(savefile, data)
@@ -0,0 +1,211 @@
+"""
+Named fields of a Magic Candle 1 save-file.
+License: GPLv3
+
+The meaning of the (decoded) bytes comes from the joined ODF/PDF file (savefile_decoding/mc1_savefile_structure.*).
+Most values are stored per hero: the 6 values of a field follow each other (ex: the current STRENGTH
+of the 6 heroes is stored at 0x0-0x5), except for the multi-bytes values (ex: the GOLD of a hero is a
+2 bytes little-endian value => the heroes' gold is stored at 0x90-0x9b) and the names.
+
+Field: name, offset (of the first hero's value), type, length (in bytes), stride (distance between 2 heroes' values)
+Types: 'u8' (1 byte), 'u16' (2 bytes, little-endian), 'str' (characters, the unused ones are 0x00)
+
+All the fields are read with a single struct.Struct (built once, when the module is loaded) from the decoded
+content of a save-file: decode_records() gives one Hero record per hero & the Game record.
+write_records() writes the records back through the editor path (see mc1/patch.py).
+"""
+import collections
+import struct
+
+from mc1.codec import xcode
+from mc1.patch import PatchError, apply_runs, check_bounds, coalesce, save_patched
+
+HERO_COUNT = 6  # number of heroes in the game
+
+Field = collections.namedtuple('Field', 'name offset type length stride')
+
+STRUCT_FORMATS = {'u8': 'B', 'u16': 'H', 'str': 's'}
+
+
+def hero_field(name, offset, type='u8', length=None, stride=None):
+    """
+    A field stored for each hero. By default, the values of the heroes follow each other (stride = length).
+    """
+    length = length or (2 if type == 'u16' else 1)
+    return Field(name, offset, type, length, stride or length)
+
+
+def game_field(name, offset, type='u8', length=None):
+    """
+    A field stored once for the whole game.
+    """
+    return Field(name, offset, type, length or (2 if type == 'u16' else 1), 0)
+
+
+STATS = ('strength', 'stamina', 'energy', 'sword_skill', 'bow_skill', 'agility',
+         'magic_level', 'charisma', 'hunter_skill', 'learn_skill', 'dexterity', 'speed')
+
+HERO_FIELDS = (
+    # Current & max values of the stats: 0x0-0x47 & 0x48-0x8f
+    *(hero_field(stat, 0x6 * i) for i, stat in enumerate(STATS)),
+    *(hero_field('max_' + stat, 0x48 + 0x6 * i) for i, stat in enumerate(STATS)),
+    hero_field('gold', 0x90, 'u16'),  # Little-endian!
+    hero_field('food', 0x9c),
+    hero_field('arrows', 0xa2),
+    hero_field('weapon1', 0xa8),  # 0=NONE, 1=SHRT SWRD, 2=SCIMITAR, etc. (see the ODF/PDF file)
+    hero_field('weapon2', 0xae),
+    hero_field('armor', 0xb4),  # 0=NONE, 1=LEATHER, 2=R MAIL, etc.
+    hero_field('name', 0x1cd, 'str', 5, 6),  # 5 chars + 0x00 (ex: LUKAS)
+    hero_field('health', 0x1f1),  # PARLYZ, POISND, ILL, EXHSTD, TIRED, HUNGRY, STRVNG
+    hero_field('magic_books', 0x227),  # bit field: 1=sabano, 2=ishban, 4=demaro, 8=zoxinn
+    hero_field('race', 0x233),  # 0=MAN, 1=WIZARD, 2=ELF, 3=HALFLING, 4=DWARF
+    hero_field('name_length', 0x23f),  # used to underline the names
+    hero_field('shield', 0x245),
+)
+
+GAME_FIELDS = (
+    game_field('place_name', 0x47a, 'str', 12),  # displayed place name (ex: CASTLE), padded with spaces
+)
+
+Hero = collections.namedtuple('Hero', ['index'] + [field.name for field in HERO_FIELDS])
+Game = collections.namedtuple('Game', [field.name for field in GAME_FIELDS])
+
+
+def _compile():
+    """
+    Build the struct.Struct reading all the fields at once: the fields are sorted by offset,
+    the unused bytes between them are skipped ('x').
+    :return: (struct.Struct, list of (column name, field, hero index or None) in the order of the unpacked values)
+    """
+    items = []
+    for field in HERO_FIELDS:
+        for hero in range(HERO_COUNT):
+            items.append((field.offset + hero * field.stride, field, hero))
+    for field in GAME_FIELDS:
+        items.append((field.offset, field, None))
+    items.sort(key=lambda item: item[0])
+
+    fmt = '<'
+    position = 0
+    layout = []
+    for offset, field, hero in items:
+        if offset < position:
+            raise ValueError("Overlapping fields in the schema: %s at %s" % (field.name, hex(offset)))
+        if offset > position:
+            fmt += '%dx' % (offset - position)
+        fmt += ('%ds' % field.length) if field.type == 'str' else STRUCT_FORMATS[field.type]
+        position = offset + field.length
+        column = field.name if hero is None else '%s_%d' % (field.name, hero + 1)
+        layout.append((column, field, hero))
+    return struct.Struct(fmt), layout
+
+
+RECORDS_STRUCT, LAYOUT = _compile()
+COLUMNS = tuple(column for column, _, _ in LAYOUT)  # ex: 'strength_1' ... 'strength_6', 'stamina_1', etc.
+_STRING_COLUMNS = tuple(i for i, (_, field, _) in enumerate(LAYOUT) if field.type == 'str')
+
+
+def _to_str(value):
+    return value.split(b'\x00', 1)[0].decode('latin-1')
+
+
+def decode_row(decoded):
+    """
+    Read all the fields from the decoded content of a save-file, in a single call.
+    :param decoded: the decoded content of the save-file (bytes, memoryview...)
+    :return: tuple of values, in the order of COLUMNS
+    """
+    if len(decoded) < RECORDS_STRUCT.size:
+        raise ValueError("The save-file is too short (%s bytes, at least %s expected)" % (
+            hex(len(decoded)), hex(RECORDS_STRUCT.size)))
+    values = list(RECORDS_STRUCT.unpack_from(decoded))
+    for i in _STRING_COLUMNS:
+        values[i] = _to_str(values[i])
+    return tuple(values)
+
+
+def decode_records(decoded):
+    """
+    Read all the fields from the decoded content of a save-file.
+    :param decoded: the decoded content of the save-file (bytes, memoryview...)
+    :return: (list of HERO_COUNT Hero records, Game record)
+    """
+    heroes = [{'index': hero} for hero in range(HERO_COUNT)]
+    game = {}
+    for (_, field, hero), value in zip(LAYOUT, decode_row(decoded)):
+        if hero is None:
+            game[field.name] = value
+        else:
+            heroes[hero][field.name] = value
+    return [Hero(**hero) for hero in heroes], Game(**game)
+
+
+def read_records(savefile):
+    """
+    Read the Hero & Game records of a save-file (see decode_records()).
+    """
+    with open(savefile, 'rb') as f:
+        return decode_records(memoryview(xcode(f.read())))
+
+
+def encode_value(field, value):
+    """
+    Encode one value of a field (as stored in the decoded content of a save-file).
+    :return: the decoded bytes of the value (PatchError: the value does not fit in the field)
+    """
+    if field.type == 'str':
+        raw = value.encode('latin-1') if isinstance(value, str) else bytes(value)
+        if len(raw) > field.length:
+            raise PatchError("'%s' is too long for the field %s (%d chars max)" % (value, field.name, field.length))
+        return raw.ljust(field.length, b'\x00')
+    try:
+        return struct.pack('<' + STRUCT_FORMATS[field.type], value)
+    except struct.error:
+        raise PatchError("Invalid value (%s) for the field %s (%s)" % (value, field.name, field.type))
+
+
+def record_edits(heroes=(), game=None, current=()):
+    """
+    Convert records into modifications for the editor (see mc1/patch.py).
+    The length of a renamed hero's name (name_length) follows the new name, as with the 'name' operation of the
+    edit scripts (see mc1/editscript.py), unless the record sets another name_length too.
+    :param heroes: Hero records (their 'index' gives the hero, 0-5)
+    :param game: Game record (None: not modified)
+    :param current: the current Hero records of the save-file, to find the renamed heroes (a name_length set to
+                    None always follows the name)
+    :return: list of (offset, decoded values as bytes)
+    """
+    current = {hero.index: hero for hero in current}
+    edits = []
+    for hero in heroes:
+        before = current.get(hero.index)
+        if hero.name_length is None or (before is not None and hero.name != before.name
+                                        and hero.name_length == before.name_length):
+            hero = hero._replace(name_length=len(hero.name))
+        for field in HERO_FIELDS:
+            edits.append((field.offset + hero.index * field.stride, encode_value(field, getattr(hero, field.name))))
+    if game is not None:
+        for field in GAME_FIELDS:
+            edits.append((field.offset, encode_value(field, getattr(game, field.name))))
+    return edits
+
+
+def write_records(savefile, heroes=(), game=None, out=None):
+    """
+    Write records in a save-file, as a single modification of the editor (see mc1/patch.py).
+    Ex: heroes, game = read_records('LUKAS1.MCS')
+        write_records('LUKAS1.MCS', [heroes[0]._replace(gold=5000, strength=30)])
+    :param savefile: name of the save-file
+    :param heroes: the (modified) Hero records
+    :param game: the (modified) Game record (None: not modified)
+    :param out: name of the new save-file (None: the save-file is modified, after a backup)
+    """
+    with open(savefile, 'rb') as f:
+        data = f.read()
+    try:
+        current = decode_records(memoryview(xcode(data)))[0]
+    except ValueError:  # too short: reported by check_bounds()
+        current = ()
+    runs = coalesce(record_edits(heroes, game, current))
+    check_bounds(runs, len(data))
+    save_patched(savefile, apply_runs(data, runs), out, data, runs)
@@ -0,0 +1,135 @@
+"""
+"Cheat-engine" style search of a value in a series of Magic Candle 1 save-files.
+License: GPLv3
+
+To find which bytes hold the gold (or the HP, etc.):
+1. save the game, start a search: all the offsets are candidates (optionally: the value must be X),
+2. change the value in the game (buy something...), save again, and filter the candidates with a predicate:
+   the value is X, increased, decreased, unchanged, changed, changed by D,
+3. repeat until a few candidates survive.
+
+The values are read as unsigned little-endian integers of 1, 2 or 4 bytes (u8, u16, u32), at every offset
+(aligned or not). The candidates are filtered with NumPy masks over the decoded bytes.
+
+The survivors (offset, type & last value of each candidate) are persisted in a .npz state file between the steps:
+a new snapshot only reads the values of the survivors, the previous snapshots are never read again.
+"""
+import io
+
+import numpy as np
+
+from mc1.diff import decode_matrix
+from mc1.patch import write_atomic
+
+TYPES = {'u8': 1, 'u16': 2, 'u32': 4}
+PREDICATES = ('eq', 'inc', 'dec', 'same', 'changed', 'delta')
+
+
+def read_values(decoded, offsets, widths):
+    """
+    Read the little-endian values of the candidates.
+    :param decoded: decoded save-file (NumPy uint8 array)
+    :param offsets: offsets of the candidates
+    :param widths: widths (1, 2 or 4 bytes) of the candidates
+    :return: NumPy array (int64) of the values
+    """
+    values = np.zeros(len(offsets), dtype=np.int64)
+    for byte in range(max(TYPES.values())):
+        mask = widths > byte
+        if not mask.any():
+            break
+        values[mask] |= decoded[offsets[mask] + byte].astype(np.int64) << (8 * byte)
+    return values
+
+
+def apply_predicate(old, new, predicate, operand=None):
+    """
+    :param old: previous values of the candidates (None for the first snapshot)
+    :param new: new values of the candidates
+    :param predicate: one of PREDICATES (or None: every candidate survives)
+    :param operand: the value of 'eq' or the difference of 'delta'
+    :return: boolean mask of the surviving candidates
+    """
+    if predicate is None:
+        return np.ones(len(new), dtype=bool)
+    if predicate == 'eq':
+        return new == operand
+    if old is None:
+        raise ValueError("The predicate '%s' needs a previous snapshot" % predicate)
+    if predicate == 'inc':
+        return new > old
+    if predicate == 'dec':
+        return new < old
+    if predicate == 'same':
+        return new == old
+    if predicate == 'changed':
+        return new != old
+    if predicate == 'delta':
+        return new - old == operand
+    raise ValueError("Unknown predicate: %s (%s)" % (predicate, ', '.join(PREDICATES)))
+
+
+def _read_snapshot(savefile):
+    with open(savefile, 'rb') as f:
+        return decode_matrix([f.read()])[0]
+
+
+def start_search(savefile, types=tuple(TYPES), predicate=None, operand=None):
+    """
+    Start a search: every offset of the save-file is a candidate, for each type.
+    :param savefile: the first snapshot
+    :param types: the types of the candidates (see TYPES)
+    :param predicate: 'eq' (the value must be 'operand') or None
+    :return: the state of the search (dict)
+    """
+    decoded = _read_snapshot(savefile)
+    length = len(decoded)
+    offsets = np.concatenate([np.arange(length - TYPES[t] + 1, dtype=np.int64) for t in types])
+    widths = np.concatenate([np.full(max(length - TYPES[t] + 1, 0), TYPES[t], dtype=np.int8) for t in types])
+    values = read_values(decoded, offsets, widths)
+    mask = apply_predicate(None, values, predicate, operand)
+    return {'offsets': offsets[mask], 'widths': widths[mask], 'values': values[mask],
+            'length': length, 'snapshots': [savefile]}
+
+
+def next_snapshot(state, savefile, predicate, operand=None):
+    """
+    Filter the survivors with a new snapshot (only the survivors are read).
+    :return: the new state of the search
+    """
+    decoded = _read_snapshot(savefile)
+    if len(decoded) != state['length']:
+        raise ValueError("%s has a different length (%s bytes, %s expected)" % (
+            savefile, hex(len(decoded)), hex(state['length'])))
+    values = read_values(decoded, state['offsets'], state['widths'])
+    mask = apply_predicate(state['values'], values, predicate, operand)
+    return {'offsets': state['offsets'][mask], 'widths': state['widths'][mask], 'values': values[mask],
+            'length': state['length'], 'snapshots': state['snapshots'] + [savefile]}
+
+
+def save_state(state, filename):
+    """
+    Write the state of a search (.npz), the previous state is replaced only once the new one is complete.
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, offsets=state['offsets'], widths=state['widths'], values=state['values'],
+             length=np.int64(state['length']), snapshots=np.array(state['snapshots'], dtype=str))
+    write_atomic(filename, buffer.getvalue())
+
+
+def load_state(filename):
+    """
+    Read the state of a search (see save_state()).
+    """
+    with np.load(filename) as data:
+        return {'offsets': data['offsets'], 'widths': data['widths'], 'values': data['values'],
+                'length': int(data['length']), 'snapshots': [str(name) for name in data['snapshots']]}
+
+
+def survivors(state, limit=None):
+    """
+    :return: list of (offset, type name, last value) of the surviving candidates
+    """
+    names = {width: name for name, width in TYPES.items()}
+    count = len(state['offsets']) if limit is None else min(limit, len(state['offsets']))
+    return [(int(state['offsets'][i]), names[int(state['widths'][i])], int(state['values'][i])) for i in range(count)]
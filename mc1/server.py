@@ -0,0 +1,323 @@
+"""
+Local HTTP/JSON server for the save-files & the Tile files: they are decoded once and kept in memory,
+so a request does not pay for a new process, the imports & the decoding of the files.
+License: GPLv3
+
+Endpoints (GET, unless said otherwise):
+  /saves                          the save-files: [{"name", "size", "mtime"}, ...]
+  /saves/<name>                   the decoded bytes: {"file", "length", "start", "values": [...]} (?start=N&length=N)
+  /saves/<name>/raw               the decoded bytes (application/octet-stream)
+  /saves/<name>/fields            the named fields: {"heroes": [{...}, ...], "game": {...}} (see mc1/schema.py)
+  POST /saves/<name>/patch        apply an edit script (the body, see mc1/editscript.py: 'offset v1 v2 ...', fill, etc.)
+                                  to the save-file (after a backup), or to a new save-file (?out=<name>)
+  /tiles                          the Tile files: [{"name", "size", "mtime"}, ...]
+  /tiles/<name>                   {"file", "tiles", "offsets": [...]}
+  /tiles/<name>/<n>.png           a tile (?scale=N, default: 2)
+  /tiles/<name>/atlas.png         all the tiles of the Tile file (?scale=N&columns=N, see mc1.tiles.build_atlas())
+  /tiles/<name>/atlas.json        the index of the atlas
+
+The decoded files are kept in memory, with the mtime & size of the file: they are decoded again as soon as the file
+changes. The responses carry an ETag computed from the mtime & size of the file and from the request, so the clients
+revalidate them with If-None-Match (=> 304 Not Modified, without a body). The generated PNG/JSON bodies are also kept,
+in a bounded LRU cache.
+The requests are handled in a pool of threads: the decoding, the PNG encoding & the writes of the save-files do not
+stall the other connections (the patches are applied one at a time).
+Only the files of the 2 served directories are reachable (plain names, no path).
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from mc1.codec import xcode
+from mc1.editscript import run_script
+from mc1.patch import PatchError, apply_runs, modified_offsets, save_patched
+from mc1.schema import decode_records
+from mc1.tiles import TileFile, build_atlas, palette_image, tile_image
+
+SAVE_EXTENSION = '.MCS'
+TILE_EXTENSION = '.TIL'
+MAX_BODY = 1024 * 1024  # maximum size of a request body (edit script)
+MAX_RESPONSES = 256  # number of generated bodies kept in memory
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _int_param(query, name, default, minimum=0):
+    try:
+        value = int(query.get(name, [default])[0], 0) if name in query else default
+    except ValueError:
+        value = None
+    if value is None or value < minimum:
+        raise HttpError(400, "Invalid parameter: %s" % name)
+    return value
+
+
+class Store:
+    """
+    The decoded files, kept in memory until their file changes (mtime & size).
+    """
+
+    def __init__(self, save_dir, tiles_dir):
+        self.dirs = {'saves': (save_dir, SAVE_EXTENSION), 'tiles': (tiles_dir, TILE_EXTENSION)}
+        self.files = {}  # path => (stat key, decoded content)
+        self.responses = OrderedDict()  # (stat key, request) => (content type, body), most recently used last
+        self.lock = threading.Lock()  # for self.responses
+        self.patch_lock = threading.Lock()  # one patch at a time
+
+    def path(self, kind, name):
+        directory, extension = self.dirs[kind]
+        if not name or name != os.path.basename(name) or name.startswith('.') or not name.upper().endswith(extension):
+            raise HttpError(404, "Unknown file: %s" % name)
+        return os.path.join(directory, name)
+
+    def listing(self, kind):
+        directory, extension = self.dirs[kind]
+        files = []
+        for name in sorted(os.listdir(directory)):
+            if name.upper().endswith(extension) and not name.startswith('.'):
+                st = os.stat(os.path.join(directory, name))
+                files.append({'name': name, 'size': st.st_size, 'mtime': st.st_mtime})
+        return files
+
+    def stat_key(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise HttpError(404, "Unknown file: %s" % os.path.basename(path))
+        return st.st_mtime_ns, st.st_size
+
+    def load(self, path, key):
+        """
+        :return: the decoded content of the file (decoded again if the file changed)
+        """
+        cached = self.files.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if path.upper().endswith(TILE_EXTENSION):
+            with TileFile(path) as tile_file:
+                content = (tile_file.offsets, tile_file.tiles())
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+            content = (data, xcode(data))
+        self.files[path] = (key, content)
+        return content
+
+    def forget(self, path):
+        self.files.pop(path, None)
+
+    def cached_response(self, key, build):
+        """
+        :return: (content type, body), built once for a given key (stat key & request)
+        """
+        with self.lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.responses.move_to_end(key)
+                return response
+        response = build()  # outside of the lock: the other requests do not wait for it
+        with self.lock:
+            self.responses[key] = response
+            if len(self.responses) > MAX_RESPONSES:
+                self.responses.popitem(last=False)
+        return response
+
+
+def etag(stat_key, target):
+    digest = hashlib.blake2b(repr((stat_key, target)).encode(), digest_size=8).hexdigest()
+    return '"%s"' % digest
+
+
+def _json(value):
+    return 'application/json', json.dumps(value).encode()
+
+
+def handle(store, method, target, body, if_none_match=()):
+    """
+    :param if_none_match: the ETags known by the client
+    :return: (status, content type, body, ETag or None)
+    """
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    parts = [unquote(part) for part in url.path.strip('/').split('/')]
+    kind = parts[0]
+    if kind not in ('saves', 'tiles'):
+        raise HttpError(404, "Unknown endpoint: %s" % url.path)
+
+    if len(parts) == 1:
+        if method != 'GET':
+            raise HttpError(405, "Method not allowed")
+        return (200,) + _json(store.listing(kind)) + (None,)
+
+    path = store.path(kind, parts[1])
+    action = parts[2] if len(parts) > 2 else ''
+    if len(parts) > 3:
+        raise HttpError(404, "Unknown endpoint: %s" % url.path)
+
+    if kind == 'saves' and action == 'patch':
+        if method != 'POST':
+            raise HttpError(405, "Method not allowed")
+        return (200,) + _json(patch_savefile(store, path, body, query)) + (None,)
+    if method != 'GET':
+        raise HttpError(405, "Method not allowed")
+
+    key = store.stat_key(path)
+    tag = etag(key, target)
+    if tag in if_none_match:  # the client already has this response
+        return 304, None, b'', tag
+    content = store.load(path, key)
+    if kind == 'saves':
+        response = store.cached_response((key, target), lambda: save_response(path, content, action, query))
+    else:
+        response = store.cached_response((key, target), lambda: tiles_response(path, content, action, query))
+    return (200,) + response + (tag,)
+
+
+def save_response(path, content, action, query):
+    data, decoded = content
+    if action == '':
+        start = _int_param(query, 'start', 0)
+        length = _int_param(query, 'length', len(decoded) - start)
+        return _json({'file': os.path.basename(path), 'length': len(decoded), 'start': start,
+                      'values': list(decoded[start:start + length])})
+    if action == 'raw':
+        return 'application/octet-stream', bytes(decoded)
+    if action == 'fields':
+        try:
+            heroes, game = decode_records(memoryview(decoded))
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        return _json({'heroes': [hero._asdict() for hero in heroes], 'game': game._asdict()})
+    raise HttpError(404, "Unknown endpoint: %s" % action)
+
+
+def tiles_response(path, content, action, query):
+    offsets, tiles = content
+    scale_factor = _int_param(query, 'scale', 2, minimum=1)
+    if action == '':
+        return _json({'file': os.path.basename(path), 'tiles': len(offsets), 'offsets': offsets})
+    if action in ('atlas.png', 'atlas.json'):
+        columns = _int_param(query, 'columns', 16, minimum=1)
+        sheet, index = build_atlas([(path, offsets, tiles)], columns, scale_factor)
+        if action == 'atlas.json':
+            return _json({'image': 'atlas.png', 'scale': scale_factor, 'tiles': index})
+        return 'image/png', _png(palette_image(sheet))
+    name, _, extension = action.partition('.')
+    if extension == 'png' and name.isdigit() and int(name) < len(tiles):
+        return 'image/png', _png(tile_image(tiles[int(name)], scale_factor))
+    raise HttpError(404, "Unknown tile: %s" % action)
+
+
+def patch_savefile(store, path, body, query):
+    """
+    Apply an edit script to a save-file (a transaction, see mc1/patch.py).
+    """
+    out = store.path('saves', query['out'][0]) if 'out' in query else None
+    try:
+        with store.patch_lock:  # 2 patches of the same save-file would lose one of them
+            with open(path, 'rb') as f:
+                data = f.read()
+            runs = run_script(data, body.decode('latin-1').splitlines())
+            save_patched(path, apply_runs(data, runs), out, data, runs)
+            store.forget(out or path)
+    except FileNotFoundError:
+        raise HttpError(404, "Unknown file: %s" % os.path.basename(path))
+    except PatchError as e:
+        raise HttpError(400, str(e))
+    return {'file': os.path.basename(out or path), 'modified': len(modified_offsets(runs)), 'runs': len(runs)}
+
+
+async def _read_request(reader):
+    """
+    :return: (method, target, headers, body), or None if the connection is closed
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Invalid request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY:
+        raise HttpError(413, "The body is too large")
+    body = await reader.readexactly(length) if length else b''
+    headers['version'] = version
+    return method, target, headers, body
+
+
+def _response(status, content_type, body, tag, keep_alive):
+    lines = ["HTTP/1.1 %d %s" % (status, REASONS.get(status, '')),
+             "Content-Length: %d" % len(body), "Cache-Control: no-cache",
+             "Connection: %s" % ('keep-alive' if keep_alive else 'close')]
+    if content_type:
+        lines.append("Content-Type: %s" % content_type)
+    if tag:
+        lines.append("ETag: %s" % tag)
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def _serve_connection(store, reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = (headers.get('connection', '').lower() != 'close' and headers['version'] == 'HTTP/1.1')
+                if_none_match = [t.strip() for t in headers.get('if-none-match', '').split(',') if t.strip()]
+                status, content_type, body, tag = await loop.run_in_executor(
+                    None, handle, store, method, target, body, if_none_match)
+            except HttpError as e:
+                status, content_type, body, tag = e.status, 'application/json', json.dumps({'error': str(e)}).encode(), None
+            except (OSError, ValueError, IndexError) as e:
+                status, content_type, body, tag = 500, 'application/json', json.dumps({'error': str(e)}).encode(), None
+            writer.write(_response(status, content_type, body, tag, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(save_dir, tiles_dir, host='127.0.0.1', port=8060, started=None):
+    """
+    Serve forever.
+    :param started: called with the listening socket addresses, once the server is started
+    """
+    store = Store(save_dir, tiles_dir)
+    server = await asyncio.start_server(lambda reader, writer: _serve_connection(store, reader, writer), host, port)
+    if started:
+        started([sock.getsockname() for sock in server.sockets])
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,225 @@
+"""
+A SQLite database of decoded Magic Candle 1 save-files, to query a whole corpus without decoding it again.
+License: GPLv3
+
+Tables:
+  contents      one row per distinct save-file content (identical files are stored once, by SHA-1):
+                the decoded bytes (BLOB)
+  files         one row per save-file (absolute path): size & mtime (ns) when it was read, its content
+  field_values  the named fields of each content (see mc1/schema.py: strength_1 ... strength_6, gold_1, name_1...),
+                indexed by (name, value): a predicate on a field is an index lookup
+
+The ingestion is incremental: a save-file whose path, size & mtime are already known is not read again, a modified
+save-file whose content is already known only updates its row. The inserts are batched in transactions.
+
+The queries are predicates over the fields or the offsets (all of them must be true):
+  gold > 5000          a field of any hero (gold_1 ... gold_6) / gold_2 > 5000: a field of the 2nd hero
+  name_1 = LUKAS       a text field
+  0x1cd = 'L'          the decoded byte at 0x1cd (a character or a number: 0x1cd = 76)
+  0x90:u16 >= 5000     a little-endian value of 2 (u16) or 4 (u32) bytes
+  0x1cd = 'LUKAS'      the decoded bytes from 0x1cd (only = and !=)
+The field predicates use the index. The offset predicates read the decoded bytes of the contents which satisfy the
+field predicates (one row per distinct content, not per save-file): storing an index entry for each offset of each
+content would make the database bigger than the corpus itself.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+
+from mc1 import timings
+from mc1.codec import xcode
+from mc1.schema import COLUMNS, HERO_COUNT, decode_row
+
+BATCH_FILES = 500  # save-files per transaction
+TYPES = {'u8': 1, 'u16': 2, 'u32': 4}
+OPERATORS = {'=': '=', '==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY,
+    sha1 TEXT NOT NULL UNIQUE,
+    length INTEGER NOT NULL,
+    decoded BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content INTEGER NOT NULL REFERENCES contents(id)
+);
+CREATE INDEX IF NOT EXISTS files_content ON files(content);
+CREATE TABLE IF NOT EXISTS field_values (
+    name TEXT NOT NULL,
+    value NOT NULL,
+    content INTEGER NOT NULL REFERENCES contents(id),
+    PRIMARY KEY (name, value, content)
+) WITHOUT ROWID;
+"""
+
+_PREDICATE = re.compile(r"^\s*([\w:]+?)\s*(==|=|!=|<=|>=|<|>)\s*(.*?)\s*$")
+
+
+def _value_at(decoded, offset, width):
+    """
+    SQL function: the little-endian value of 'width' bytes at the offset (NULL: out of the content)
+    """
+    if decoded is None or offset + width > len(decoded):
+        return None
+    return int.from_bytes(decoded[offset:offset + width], 'little')
+
+
+def connect(database):
+    """
+    Open (or create) a snapshot database.
+    :return: sqlite3 connection
+    """
+    connection = sqlite3.connect(database)
+    connection.execute("PRAGMA cache_size = -65536")  # 64 MB: the index of the fields is filled in random order
+    connection.executescript(SCHEMA)
+    connection.create_function('mc1_value', 3, _value_at, deterministic=True)
+    return connection
+
+
+def _content_id(connection, data):
+    """
+    :return: (id of the content, True if the content is new), the content is stored with its fields if it is new
+    """
+    sha1 = hashlib.sha1(data).hexdigest()
+    row = connection.execute("SELECT id FROM contents WHERE sha1 = ?", (sha1,)).fetchone()
+    if row:
+        return row[0], False
+    with timings.phase('decode'):
+        decoded = xcode(data)
+        try:
+            fields = list(zip(COLUMNS, decode_row(decoded)))
+        except ValueError:  # too short for the named fields: only the offsets can be queried
+            fields = []
+    with timings.phase('insert'):
+        content = connection.execute("INSERT INTO contents (sha1, length, decoded) VALUES (?, ?, ?)",
+                                     (sha1, len(decoded), decoded)).lastrowid
+        connection.executemany("INSERT INTO field_values (name, value, content) VALUES (?, ?, ?)",
+                               [(name, value, content) for name, value in fields])
+    return content, True
+
+
+def ingest(connection, savefiles, prune=False):
+    """
+    Add the save-files to the database (or update them), the unchanged ones are skipped (same path, size & mtime).
+    :param savefiles: list of save-file names
+    :param prune: forget the save-files of the database which do not exist anymore (& their unused contents)
+    :return: dict of counts: 'added', 'updated', 'skipped', 'contents' (new contents), 'removed'
+    """
+    counts = {'added': 0, 'updated': 0, 'skipped': 0, 'contents': 0, 'removed': 0}
+    known = {path: (size, mtime_ns) for path, size, mtime_ns in
+             connection.execute("SELECT path, size, mtime_ns FROM files")}
+    pending = 0
+    for savefile in savefiles:
+        path = os.path.abspath(savefile)
+        st = os.stat(path)
+        if known.get(path) == (st.st_size, st.st_mtime_ns):
+            counts['skipped'] += 1
+            continue
+        with timings.phase('read'):
+            with open(path, 'rb') as f:
+                data = f.read()
+        timings.count('bytes_read', len(data))
+        content, new = _content_id(connection, data)
+        counts['contents'] += new
+        counts['updated' if path in known else 'added'] += 1
+        with timings.phase('insert'):
+            connection.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, content) VALUES (?, ?, ?, ?)",
+                               (path, st.st_size, st.st_mtime_ns, content))
+        pending += 1
+        if pending >= BATCH_FILES:
+            connection.commit()
+            pending = 0
+    if prune:
+        missing = [(path,) for path in known if not os.path.exists(path)]
+        connection.executemany("DELETE FROM files WHERE path = ?", missing)
+        counts['removed'] = len(missing)
+        unused = "SELECT id FROM contents WHERE id NOT IN (SELECT content FROM files)"
+        connection.execute("DELETE FROM field_values WHERE content IN (%s)" % unused)
+        connection.execute("DELETE FROM contents WHERE id NOT IN (SELECT content FROM files)")
+    connection.commit()
+    return counts
+
+
+def _literal(text):
+    """
+    :return: the value of a predicate: an integer (decimal or 0x hexa), or a text (quotes are optional)
+    """
+    if len(text) > 1 and text[0] == text[-1] and text[0] in '"\'':
+        return text[1:-1]
+    try:
+        return int(text, 0)
+    except ValueError:
+        return text
+
+
+def parse_predicate(text):
+    """
+    Compile a predicate (see the module documentation) into SQL.
+    :return: (SQL condition on the 'contents' table, parameters)
+    """
+    match = _PREDICATE.match(text)
+    if not match or not match.group(3):
+        raise ValueError("Invalid predicate: %s (ex: 'gold > 5000', '0x1cd = L')" % text)
+    target, operator, value = match.group(1), OPERATORS[match.group(2)], _literal(match.group(3))
+
+    if target.lower().startswith('0x'):
+        offset, _, type_name = target.partition(':')
+        width = TYPES.get(type_name or 'u8')
+        if width is None:
+            raise ValueError("Unknown type: %s (%s)" % (type_name, ', '.join(TYPES)))
+        try:
+            offset = int(offset, 16)
+        except ValueError:
+            raise ValueError("Invalid offset: %s" % offset)
+        if isinstance(value, str):
+            if len(value) == 1 and not type_name:
+                value = ord(value)
+            elif operator in ('=', '!='):
+                raw = value.encode('latin-1')
+                return "substr(decoded, ?, ?) %s ?" % operator, [offset + 1, len(raw), raw]
+            else:
+                raise ValueError("Only = and != are allowed with a text: %s" % text)
+        return "mc1_value(decoded, ?, ?) %s ?" % operator, [offset, width, value]
+
+    names = [target] if target in COLUMNS else [
+        '%s_%d' % (target, hero + 1) for hero in range(HERO_COUNT) if '%s_%d' % (target, hero + 1) in COLUMNS]
+    if not names:
+        raise ValueError("Unknown field: %s (see mc1/schema.py)" % target)
+    return ("id IN (SELECT content FROM field_values WHERE name IN (%s) AND value %s ?)"
+            % (', '.join('?' * len(names)), operator), names + [value])
+
+
+def query(connection, predicates, limit=None):
+    """
+    :param predicates: list of predicates (see parse_predicate()), all of them must be true
+    :return: list of the paths of the matching save-files (sorted)
+    """
+    conditions, parameters = [], []
+    for predicate in predicates:
+        condition, values = parse_predicate(predicate)
+        conditions.append(condition)
+        parameters += values
+    sql = "SELECT path FROM files"
+    if conditions:  # evaluated once per distinct content
+        sql += " WHERE content IN (SELECT id FROM contents WHERE %s)" % " AND ".join(conditions)
+    sql += " ORDER BY path"
+    if limit is not None:
+        sql += " LIMIT %d" % limit
+    with timings.phase('query'):
+        return [path for path, in connection.execute(sql, parameters)]
+
+
+def statistics(connection):
+    """
+    :return: dict: number of 'files', distinct 'contents', size of the 'database' (bytes)
+    """
+    files, = connection.execute("SELECT count(*) FROM files").fetchone()
+    contents, = connection.execute("SELECT count(*) FROM contents").fetchone()
+    page_count, = connection.execute("PRAGMA page_count").fetchone()
+    page_size, = connection.execute("PRAGMA page_size").fetchone()
+    return {'files': files, 'contents': contents, 'database': page_count * page_size}
@@ -0,0 +1,92 @@
+"""
+Synthetic "The Magic Candle 1" files, for the benchmarks (the real game files cannot be shipped).
+License: GPLv3
+
+- save-files: SAVEFILE_LENGTH bytes (the length of the real save-files), random decoded values (repeatable:
+  the random generator is seeded) with realistic hero names & place name (see mc1/schema.py), XOR encoded
+  (see mc1/codec.py), so that every tool reads them as real save-files.
+- Tile files: a valid offset header (little-endian, terminated by 0xFFFF when there are less than 128 tiles),
+  the 2 padding bytes, the tiles (112 bytes of random pixels + 2 padding bytes each), some empty bytes at the end.
+"""
+import os
+import random
+import struct
+
+from mc1.codec import xcode
+from mc1.schema import GAME_FIELDS, HERO_COUNT, Game, decode_records, record_edits
+from mc1.tiles import HEADER_SIZE, MAX_TILES, NO_TILE, TILE_PACKED_SIZE
+
+SAVEFILE_LENGTH = 0x924  # length of the save-files written by the game
+TILE_BLOCK_SIZE = TILE_PACKED_SIZE + 2  # the packed pixels + 2 padding bytes
+TILEFILE_TRAILER = 0x80  # the empty bytes at the end of a Tile file
+
+NAMES = ('LUKAS', 'SAKAR', 'ESTER', 'BRAND', 'ZORIN', 'MAVIS', 'TELOR', 'ROLLO')
+PLACES = ('CASTLE', 'OSHCROFT', 'PHAEDRA', 'BLYTHE', 'PREMIS', 'DERMAGUD')
+
+
+def decoded_savefile(seed=0, length=SAVEFILE_LENGTH):
+    """
+    :return: the decoded content of a synthetic save-file (bytes)
+    """
+    rng = random.Random(seed)
+    decoded = bytearray(rng.getrandbits(8) for _ in range(length))
+    if length >= SAVEFILE_LENGTH:
+        heroes, _ = decode_records(decoded)
+        heroes = [hero._replace(name=rng.choice(NAMES), name_length=5, gold=rng.randrange(5000))
+                  for hero in heroes[:HERO_COUNT]]
+        game = Game(**{field.name: rng.choice(PLACES).ljust(field.length) for field in GAME_FIELDS})
+        for offset, values in record_edits(heroes, game):
+            decoded[offset:offset + len(values)] = values
+    return bytes(decoded)
+
+
+def savefile_data(seed=0, length=SAVEFILE_LENGTH):
+    """
+    :return: the (encoded) content of a synthetic save-file
+    """
+    return xcode(decoded_savefile(seed, length))
+
+
+def tilefile_data(tiles=MAX_TILES, seed=0):
+    """
+    :param tiles: number of tiles (at most MAX_TILES)
+    :return: the content of a synthetic Tile file
+    """
+    if not 0 <= tiles <= MAX_TILES:
+        raise ValueError("A Tile file has at most %s tiles" % MAX_TILES)
+    rng = random.Random(seed)
+    offsets = [num_tile * TILE_BLOCK_SIZE for num_tile in range(tiles)] + [NO_TILE] * (MAX_TILES - tiles)
+    header = struct.pack('<%dH' % MAX_TILES, *offsets)
+    assert len(header) == HEADER_SIZE
+    blocks = b''.join(bytes(rng.getrandbits(8) for _ in range(TILE_PACKED_SIZE)) + b'\x00\x00' for _ in range(tiles))
+    return header + b'\x00\x00' + blocks + bytes(TILEFILE_TRAILER)
+
+
+def write_savefiles(directory, count, prefix='SYNTH', seed=0):
+    """
+    Write 'count' synthetic save-files (<prefix>N.MCS, N from 1) in the directory.
+    :return: the names of the save-files
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for num in range(count):
+        name = os.path.join(directory, "{0}{1}.MCS".format(prefix, num + 1))
+        with open(name, 'wb') as f:
+            f.write(savefile_data(seed + num))
+        names.append(name)
+    return names
+
+
+def write_tilefiles(directory, count, tiles=MAX_TILES, seed=0):
+    """
+    Write 'count' synthetic Tile files (EGA<N>.TIL) in the directory.
+    :return: the names of the Tile files
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for num in range(count):
+        name = os.path.join(directory, "EGA{0}.TIL".format(num + 1))
+        with open(name, 'wb') as f:
+            f.write(tilefile_data(tiles, seed + num))
+        names.append(name)
+    return names
@@ -0,0 +1,140 @@
+"""
+Cross-file index of the tiles of "The Magic Candle 1" Tile files: the tiles which appear in several
+files (or several times in a file) are only stored once.
+License: GPLv3
+
+Each tile is identified by its 112 packed bytes: the identical tiles get the same tile id (0, 1, ..., in the order
+of their first occurrence) and are stored once. A tile reference (Tile file, tile number) is resolved in O(1):
+starts[file] + tile number gives the position of the reference in the 'refs' array, which holds its tile id.
+The 'hash' of a tile is the BLAKE2b (8 bytes) digest of its packed bytes.
+
+==========================================
+The index file format (little-endian)
+==========================================
+0x00-0x17: header: magic (8 bytes, INDEX_MAGIC), number of files, of unique tiles, of references (3 * uint32),
+           size of the names block (uint32)
++ names:   the names of the Tile files (without directory), UTF-8, '\n' separated
++ files:   files * (first reference, number of tiles) (2 * uint32)
++ hashes:  unique tiles * 8 bytes
++ tiles:   unique tiles * 112 bytes (the packed bytes, as in the Tile files: this is the deduplicated tile store)
++ refs:    references * (tile id, offset of the tile in its Tile file) (2 * uint32)
+==========================================
+"""
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+from mc1.patch import write_atomic
+from mc1.tiles import TILE_PACKED_SIZE, TileFile, decode_tiles
+
+INDEX_MAGIC = b'MC1TIDX\x01'
+HEADER_STRUCT = struct.Struct('<8sIIII')
+HASH_SIZE = 8
+
+
+def build_index(tilefiles):
+    """
+    Read the Tile files & deduplicate their tiles.
+    :param tilefiles: names of the Tile files
+    :return: the index (dict, see the file format)
+    """
+    names, starts, unique, hashes, tile_ids, offsets = [], [], [], [], [], []
+    ids = {}  # packed bytes => tile id
+    for tilefile in tilefiles:
+        with TileFile(tilefile) as tile_file:
+            names.append(os.path.basename(tilefile))
+            starts.append((len(tile_ids), len(tile_file)))
+            for offset, packed in zip(tile_file.offsets, tile_file.packed()):
+                key = packed.tobytes()
+                tile_id = ids.get(key)
+                if tile_id is None:
+                    tile_id = ids[key] = len(unique)
+                    unique.append(key)
+                    hashes.append(hashlib.blake2b(key, digest_size=HASH_SIZE).digest())
+                tile_ids.append(tile_id)
+                offsets.append(offset)
+    return {'files': names,
+            'starts': np.array(starts, dtype='<u4').reshape(-1, 2),
+            'hashes': np.frombuffer(b''.join(hashes), dtype=np.uint8).reshape(-1, HASH_SIZE),
+            'tiles': np.frombuffer(b''.join(unique), dtype=np.uint8).reshape(-1, TILE_PACKED_SIZE),
+            'refs': np.array(list(zip(tile_ids, offsets)), dtype='<u4').reshape(-1, 2)}
+
+
+def save_index(index, filename):
+    names = '\n'.join(index['files']).encode('utf-8')
+    header = HEADER_STRUCT.pack(INDEX_MAGIC, len(index['files']), len(index['tiles']), len(index['refs']), len(names))
+    write_atomic(filename, b''.join([header, names, index['starts'].astype('<u4').tobytes(), index['hashes'].tobytes(),
+                                     index['tiles'].tobytes(), index['refs'].astype('<u4').tobytes()]))
+
+
+def load_index(filename):
+    """
+    Read an index file (see save_index()), the arrays are not copied.
+    :return: the index (dict)
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER_STRUCT.size or data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError("%s is not a tile index" % filename)
+    _, files, uniques, refs, names_size = HEADER_STRUCT.unpack_from(data)
+    position = HEADER_STRUCT.size
+    names = data[position:position + names_size].decode('utf-8')
+    position += names_size
+
+    sections = {}
+    for name, dtype, count, width in (('starts', '<u4', files, 2), ('hashes', np.uint8, uniques, HASH_SIZE),
+                                      ('tiles', np.uint8, uniques, TILE_PACKED_SIZE), ('refs', '<u4', refs, 2)):
+        size = np.dtype(dtype).itemsize * count * width
+        if position + size > len(data):
+            raise ValueError("%s is truncated" % filename)
+        sections[name] = np.frombuffer(data, dtype=dtype, count=count * width, offset=position).reshape(-1, width)
+        position += size
+    sections['files'] = names.split('\n') if files else []
+    return sections
+
+
+def file_numbers(index):
+    """
+    :return: dict Tile file name (without directory) => its number in the index
+    """
+    return {name: num for num, name in enumerate(index['files'])}
+
+
+def resolve(index, file_number, num_tile):
+    """
+    :param file_number: number of the Tile file in the index (see file_numbers())
+    :return: the tile id of the tile 'num_tile' of the Tile file
+    """
+    start, count = index['starts'][file_number]
+    if not 0 <= num_tile < count:
+        raise IndexError("%s: no tile %s (%s tiles)" % (index['files'][file_number], num_tile, count))
+    return int(index['refs'][start + num_tile, 0])
+
+
+def occurrences(index, tile_id):
+    """
+    :return: list of the (Tile file name, tile number, offset) where the tile appears
+    """
+    found = []
+    for position in np.flatnonzero(index['refs'][:, 0] == tile_id):
+        # (a file without tiles has the same start as the next file: side='right' skips it)
+        file_number = int(np.searchsorted(index['starts'][:, 0], position, side='right')) - 1
+        found.append((index['files'][file_number], int(position - index['starts'][file_number, 0]),
+                      int(index['refs'][position, 1])))
+    return found
+
+
+def hash_ids(index):
+    """
+    :return: dict hash (hexadecimal string) => tile id
+    """
+    return {digest.tobytes().hex(): tile_id for tile_id, digest in enumerate(index['hashes'])}
+
+
+def unique_tiles(index):
+    """
+    :return: the decoded unique tiles (see mc1.tiles.decode_tiles()), the tile id being the position in the array
+    """
+    return decode_tiles(index['tiles'].tobytes(), np.arange(len(index['tiles'])) * TILE_PACKED_SIZE)
@@ -0,0 +1,339 @@
+"""
+Decode the tiles of "The Magic Candle 1" EGA Tile files (<game directory>/TILES/EGAxx.TIL).
+License: GPLv3
+
+==========================================
+The TIL file format
+==========================================
+0-0xFF: header
+   The header is an array of 128 2-bytes blocks (little-endian: 0x0102 is stored as 02 01),
+   each of them contain the offset of the first byte of a tile (relative to 0x102).
+   This means that each file contains a maximum of 128 tiles.
+   If an offset is 0xffff, this means that the rest of
+   the header is not used (all the next ones are 0xffff).
+
+0x100-0x101: padding/separator
+
++ TILE block 0: 8*14 (pixels) + 2 (padding) => 114 bytes per tile
+     0x00-0x07: line 1 (16 pixels!, 2 colors packed in each byte)
+     ...
+     0x62-0x69: line 14
+     0x70-0x71: padding/separator
++ TILE block 1
+   ...
+   etc (N tiles)
+   ...
++ TILE block N: last tile of the file
+     0x00-0x07: line 1
+     ...
+     0x62-0x69: line 14
+     0x70-0x71: padding/separator
+0x??-EOF: some empty bytes (0x00) at the end, padding?, unknown usage
+==========================================
+
+All the tiles of a file are decoded at once with NumPy: the packed bytes of the tiles are gathered in a
+(tiles, 14, 8) array, each byte is split in its 2 nibbles => (tiles, 14, 16) array of EGA color numbers (0-15).
+The RGB images are obtained with a lookup in the (16, 3) EGA palette.
+
+TileFile: random access to the tiles of a file (mmapped), the tiles are only decoded when they are used,
+the last used ones are kept in a (bounded) LRU cache.
+
+NumPy & PIL are only imported by the functions which need them: reading the header does not load them
+(import_libraries() loads them in advance, in an 'import' phase of the timings).
+
+Atlas: instead of one PNG per tile, all the tiles of one or several files can be packed in a single
+palette-indexed ("P" mode, 16 colors EGA palette) image, with a JSON index giving the position of each tile.
+"""
+import json
+import os
+import struct
+from collections import OrderedDict
+from mmap import ACCESS_READ, mmap
+
+from mc1 import timings
+
+
+# Tiles are 16x14 pixels (but only use 8x14 bytes)
+TILE_PACKED_W = 8  # 8 bytes/line
+TILE_WIDTH = TILE_PACKED_W * 2  # each byte of a line packs 2 pixels (1 pixel/nibble) => 16 pixels
+TILE_HEIGHT = 14
+TILE_PACKED_SIZE = TILE_PACKED_W * TILE_HEIGHT  # 112 bytes
+
+HEADER_SIZE = 0x100  # the header is always 256 bytes long
+TILES_START = HEADER_SIZE + 2  # the tile offsets of the header are relative to the end of the header + 2 padding chars
+MAX_TILES = HEADER_SIZE // 2
+NO_TILE = 0xFFFF
+HEADER_STRUCT = struct.Struct('<%dH' % MAX_TILES)  # the whole header, in one call
+
+# Match the Tile file value with the ASCII colors (for console display)
+# & the EGA color for the generated tile files.
+# Key: value read from the file (16 values corresponding to the EGA 16 colors mode)
+#    => Values: console escape code, color name, (RGB value)
+#       The console values appear _twice_ because their brightness is.
+#       given as another parameter (not intuitive if you don't know this format)
+#       Their colors are _approximated_ only!
+colors = {
+    0x0: (30, "Black", (0, 0, 0)),
+    0x1: (34, "Blue", (0, 0, 170)),
+    0x2: (32, "Green", (0, 170, 0)),
+    0x3: (36, "Cyan", (0, 170, 170)),
+    0x4: (31, "Red", (170, 0, 0)),
+    0x5: (35, "Magenta", (170, 0, 170)),
+    0x6: (33, "Yellow", (170, 85, 0)),
+    0x7: (37, "White/Light Grey", (170, 170, 170)),
+
+    0x8: (30, "Dark Grey", (85, 85, 85)),
+    0x9: (34, "Highlighted Blue", (85, 85, 255)),
+    0xa: (32, "Highlighted Green", (85, 255, 85)),
+    0xb: (36, "Highlighted Cyan", (85, 255, 255)),
+    0xc: (31, "Highlighted Red", (255, 85, 85)),
+    0xd: (35, "Highlighted Magenta", (255, 85, 255)),
+    0xe: (33, "Highlighted yellow", (255, 255, 85)),
+    0xf: (37, "White", (255, 255, 255))
+}
+
+# EGA color number => RGB (lookup table)
+PALETTE = tuple(colors[color][2] for color in range(16))
+
+
+def tile_offsets(data):
+    """
+    Read the header of a Tile file.
+    :param data: the content of the Tile file
+    :return: list of the (absolute) offsets of the tiles
+    """
+    with timings.phase('header'):
+        header = bytes(data[:min(HEADER_SIZE, len(data)) & ~1])
+        header += b'\xff' * (HEADER_SIZE - len(header))  # (truncated file: no more tiles)
+        offsets = []
+        for val in HEADER_STRUCT.unpack(header):
+            if val == NO_TILE:  # the next offset will all be 0xffff => no tiles
+                break
+            offsets.append(val + TILES_START)
+    return offsets
+
+
+def packed_tiles(data, offsets):
+    """
+    :param data: the content of the Tile file (bytes, mmap...)
+    :param offsets: the (absolute) offsets of the tiles
+    :return: NumPy array (tiles, TILE_PACKED_SIZE): the packed bytes of the tiles (as stored in the file)
+    """
+    import numpy as np
+
+    raw = np.frombuffer(data, dtype=np.uint8)
+    index = np.asarray(offsets, dtype=np.intp).reshape(-1, 1) + np.arange(TILE_PACKED_SIZE)
+    return raw[index].reshape(-1, TILE_PACKED_SIZE)
+
+
+def decode_tiles(data, offsets):
+    """
+    Decode tiles: each byte packs _2_ pixel values in the [0-15] range (high nibble = left pixel)
+    (This packing is possible since the EGA mode only allows 16 colors...)
+    :param data: the content of the Tile file (bytes, mmap...)
+    :param offsets: the (absolute) offsets of the tiles to decode
+    :return: NumPy array (tiles, TILE_HEIGHT, TILE_WIDTH) of EGA color numbers
+    """
+    import numpy as np
+
+    with timings.phase('unpack'):
+        packed = packed_tiles(data, offsets).reshape(-1, TILE_HEIGHT, TILE_PACKED_W)
+
+        pixels = np.empty((len(packed), TILE_HEIGHT, TILE_WIDTH), dtype=np.uint8)
+        pixels[:, :, 0::2] = packed >> 4  # >>4 to shift bits right => gives a [0-15] value
+        pixels[:, :, 1::2] = packed & 0x0f
+    return pixels
+
+
+def import_libraries():
+    """
+    Import NumPy & PIL (with its image formats) now, instead of on the first use: the time of the imports is
+    measured in its own phase, not in the phase of the first tile (see mc1/timings.py).
+    """
+    with timings.phase('import'):
+        import numpy  # noqa: F401
+        from PIL import Image
+
+        Image.preinit()
+
+
+def tile_image(pixels, scale_factor=1):
+    """
+    Build the RGB image of a tile, in a single call.
+    :param pixels: (TILE_HEIGHT, TILE_WIDTH) array of EGA color numbers
+    :param scale_factor: the image is scaled (the original 16x14 size is too small on a modern screen)
+    :return: PIL image
+    """
+    import numpy as np
+    from PIL import Image
+
+    with timings.phase('image'):
+        im = Image.fromarray(np.array(PALETTE, dtype=np.uint8)[pixels], 'RGB')
+        if scale_factor != 1:
+            im = im.resize((im.width * scale_factor, im.height * scale_factor))
+    return im
+
+
+def save_png(image, filename):
+    """
+    Write a PIL image as a PNG file.
+    """
+    with timings.phase('png'):
+        image.save(filename, "PNG")
+    timings.count_file(filename)
+
+
+class TileFile:
+    """
+    Random access to the tiles of a Tile file: tile_file[n] is the decoded tile n (see decode_tiles()).
+    The file is mmapped, a tile is only decoded when it is used and the last 'cache_size' decoded tiles are kept.
+    The decoded tiles are read-only arrays (they are shared with the cache).
+    """
+
+    def __init__(self, filename, cache_size=32):
+        self.filename = filename
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # tile number => decoded tile, the most recently used last
+        self._file = open(filename, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            self._data = mmap(self._file.fileno(), 0, access=ACCESS_READ) if size else b''
+        except BaseException:
+            self._file.close()
+            raise
+        timings.count('files_read')
+        timings.count('bytes_read', size)
+        self.offsets = tile_offsets(self._data)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, num_tile):
+        if num_tile < 0:
+            num_tile += len(self.offsets)
+        if not 0 <= num_tile < len(self.offsets):
+            raise IndexError("%s: no tile %s (%s tiles)" % (self.filename, num_tile, len(self.offsets)))
+        pixels = self._cache.get(num_tile)
+        if pixels is None:
+            pixels = decode_tiles(self._data, self.offsets[num_tile:num_tile + 1])[0]
+            pixels.setflags(write=False)
+            self._cache[num_tile] = pixels
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(num_tile)
+        return pixels
+
+    def __iter__(self):
+        return (self[num_tile] for num_tile in range(len(self.offsets)))
+
+    def tiles(self):
+        """
+        :return: all the tiles, decoded at once (the cache is not used)
+        """
+        return decode_tiles(self._data, self.offsets)
+
+    def packed(self):
+        """
+        :return: the packed bytes of all the tiles (see packed_tiles())
+        """
+        return packed_tiles(self._data, self.offsets)
+
+    def image(self, num_tile, scale_factor=1):
+        return tile_image(self[num_tile], scale_factor)
+
+    def close(self):
+        self._cache.clear()
+        if isinstance(self._data, mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def scale_pixels(pixels, scale_factor):
+    """
+    Nearest-neighbor scaling of an image (array of color numbers): each pixel is repeated.
+    """
+    if scale_factor == 1:
+        return pixels
+    return pixels.repeat(scale_factor, axis=-2).repeat(scale_factor, axis=-1)
+
+
+def palette_image(pixels):
+    """
+    Build a palette-indexed ("P" mode) image, with the 16 colors EGA palette.
+    :param pixels: 2 dimensional array of EGA color numbers
+    """
+    import numpy as np
+    from PIL import Image
+
+    im = Image.fromarray(np.ascontiguousarray(pixels, dtype=np.uint8), 'P')
+    im.putpalette(bytes(value for rgb in PALETTE for value in rgb))
+    return im
+
+
+def tile_sheet(tiles, columns=16):
+    """
+    Lay out tiles in a grid, row by row (the last row is completed with black tiles).
+    :param tiles: NumPy array (tiles, TILE_HEIGHT, TILE_WIDTH) of EGA color numbers
+    :param columns: number of tiles per row
+    :return: NumPy array (rows * TILE_HEIGHT, columns * TILE_WIDTH) of EGA color numbers
+    """
+    import numpy as np
+
+    count = len(tiles)
+    rows = -(-count // columns)
+    # (rows, columns, 14, 16) => (rows * 14, columns * 16)
+    padded = np.zeros((rows * columns, TILE_HEIGHT, TILE_WIDTH), dtype=np.uint8)
+    padded[:count] = tiles
+    sheet = padded.reshape(rows, columns, TILE_HEIGHT, TILE_WIDTH).transpose(0, 2, 1, 3)
+    return sheet.reshape(rows * TILE_HEIGHT, columns * TILE_WIDTH)
+
+
+def build_atlas(tilesets, columns=16, scale_factor=1):
+    """
+    Pack the tiles of one or several Tile files in a single sheet.
+    :param tilesets: list of (file name, tile offsets, decoded tiles (see decode_tiles()))
+    :param columns: number of tiles per row of the sheet
+    :param scale_factor: the whole sheet is scaled (nearest-neighbor)
+    :return: (sheet as a 2 dimensional array of EGA color numbers, index: list of dicts, one per tile)
+    """
+    import numpy as np
+
+    tiles = [pixels for _, _, pixels in tilesets if len(pixels)]
+    tiles = np.concatenate(tiles) if tiles else np.zeros((0, TILE_HEIGHT, TILE_WIDTH), dtype=np.uint8)
+    columns = max(1, min(columns, len(tiles)))
+    sheet = scale_pixels(tile_sheet(tiles, columns), scale_factor)
+
+    index = []
+    position = 0
+    width, height = TILE_WIDTH * scale_factor, TILE_HEIGHT * scale_factor
+    for filename, offsets, pixels in tilesets:
+        for num_tile, offset in enumerate(offsets[:len(pixels)]):
+            row, col = divmod(position, columns)
+            index.append({'file': os.path.basename(filename), 'tile': num_tile, 'offset': offset,
+                          'x': col * width, 'y': row * height, 'w': width, 'h': height})
+            position += 1
+    return sheet, index
+
+
+def save_atlas(filename, tilesets, columns=16, scale_factor=1):
+    """
+    Write the atlas of the tiles (see build_atlas()) as a PNG file, and its index as <filename>.json
+    :return: the index
+    """
+    with timings.phase('atlas'):
+        sheet, index = build_atlas(tilesets, columns, scale_factor)
+        image = palette_image(sheet)
+    save_png(image, filename)
+    index_name = os.path.splitext(filename)[0] + '.json'
+    with timings.phase('write'):
+        with open(index_name, 'w') as f:
+            json.dump({'image': os.path.basename(filename), 'scale': scale_factor, 'tiles': index}, f, indent=1)
+    timings.count_file(index_name)
+    return index
@@ -0,0 +1,153 @@
+"""
+Where does the time go? Per-phase timings of the scripts (--timings, --timings-json, --profile).
+License: GPLv3
+
+The shared code marks its phases (ex: 'decode', 'format', 'print' for the decoder; 'parse', 'encode', 'backup',
+'write' for the editor; 'header', 'unpack', 'image', 'png' for the Tile files) and counts what it reads & writes:
+    with timings.phase('decode'):
+        decoded = xcode(data)
+    timings.count('bytes_read', len(data))
+
+Nothing is measured unless a script enables it (see instrumented()): phase() then costs a function call.
+The time of a phase excludes the time of the phases nested inside it (ex: 'format' inside 'print'), so the
+phases add up to the total time ('other' is the time spent outside of any phase: the glue code, the messages...).
+The clock starts once the options are parsed: the imports at the top of the scripts & the argument parsing are not
+measured. The libraries loaded on demand (NumPy & PIL for the Tile files) are measured in an 'import' phase.
+Only the main process is measured: in the batch modes, the work of the pool of processes is in the phase
+which waits for it (the files it reads & writes are counted by the main process, from the results).
+The counters 'bytes_written' & 'files_written' are about the written files; the dump printed on STDOUT (--dump)
+is counted in 'chars_printed'.
+
+The report (on STDERR):
+phase               seconds    calls      %
+decode                0.000        1    0.2
+format                0.002        1   19.9
+...
+"""
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+_active = None  # the Timings of the running script (None: nothing is measured)
+_NO_PHASE = contextlib.nullcontext()
+
+
+class Timings:
+    """
+    Wall time & number of calls of each phase, plus counters (bytes read/written, files written...)
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = OrderedDict()  # name => [seconds, calls]
+        self.counters = OrderedDict()  # name => value
+        self._stack = []  # the running phases: [start time, time of the nested phases]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += elapsed - frame[1]
+            entry[1] += 1
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """
+        :return: the timings as a dict (the JSON summary)
+        """
+        total = time.perf_counter() - self.start
+        return {'total': total,
+                'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.phases.items()},
+                'other': total - sum(seconds for seconds, _ in self.phases.values()),
+                'counters': dict(self.counters)}
+
+    def report(self, out=None):
+        """
+        Print the timings (default: on STDERR).
+        """
+        summary = self.summary()
+        total = summary['total'] or 1.0
+        lines = ["{0:16} {1:>10} {2:>8} {3:>6}".format('phase', 'seconds', 'calls', '%')]
+        for name, phase in summary['phases'].items():
+            lines.append("{0:16} {1:10.3f} {2:8} {3:6.1f}".format(name, phase['seconds'], phase['calls'],
+                                                                  100 * phase['seconds'] / total))
+        lines.append("{0:16} {1:10.3f} {2:>8} {3:6.1f}".format('other', summary['other'], '', 100 * summary['other'] / total))
+        lines.append("{0:16} {1:10.3f}".format('total', summary['total']))
+        lines += ["{0:16} {1:10}".format(name, value) for name, value in summary['counters'].items()]
+        (out or sys.stderr).write('\n'.join(lines) + '\n')
+
+
+def phase(name):
+    """
+    :return: a context manager measuring a phase (nothing is measured when the timings are not enabled)
+    """
+    return _active.phase(name) if _active is not None else _NO_PHASE
+
+
+def count(name, value=1):
+    if _active is not None:
+        _active.count(name, value)
+
+
+def count_file(filename):
+    """
+    Count a written file & its size.
+    """
+    if _active is not None:
+        _active.count('files_written')
+        _active.count('bytes_written', os.path.getsize(filename))
+
+
+def add_arguments(parser):
+    """
+    Add the --timings, --timings-json & --profile options to the parser of a script.
+    """
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--timings', action='store_true',
+                       help='Print the time spent in each phase, and the bytes read/written (on STDERR)')
+    group.add_argument('--timings-json', metavar='FILE', help='Write the timings as JSON ("-": STDERR)')
+    group.add_argument('--profile', metavar='out.prof', help='Write a cProfile capture (see the pstats module)')
+
+
+@contextlib.contextmanager
+def instrumented(args):
+    """
+    Measure the code run inside the 'with' block, as requested by the options of the script (see add_arguments()).
+    The timings are reported even if the script stops with an error.
+    """
+    global _active
+    timings = Timings() if args.timings or args.timings_json else None
+    profiler = cProfile.Profile() if args.profile else None
+    _active = timings
+    if profiler:
+        profiler.enable()
+    try:
+        yield timings
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        _active = None
+        if timings and args.timings:
+            timings.report()
+        if timings and args.timings_json:
+            text = json.dumps(timings.summary(), indent=1)
+            if args.timings_json == '-':
+                print(text, file=sys.stderr)
+            else:
+                with open(args.timings_json, 'w') as f:
+                    f.write(text + '\n')
@@ -0,0 +1,194 @@
+"""
+Watch a directory of Magic Candle 1 save-files (ex: the game directory used by DOSBox).
+License: GPLv3
+
+Each time the game writes a save-file (xxxxx1.MCS to xxxxx8.MCS), only that file is read & decoded, and
+compared with its previous (decoded) content, kept in memory.
+
+The changes are detected:
+- with inotify (Linux, through ctypes: no extra module needed): the kernel gives the name of the written file,
+- otherwise by polling: the known save-files are checked (mtime & size) every 'poll_interval' seconds, the
+  directory is only listed again when its own mtime changes (a save-file was created/renamed).
+
+A save-file is written in several parts by the game: it is only read once no change has been seen for
+'settle' seconds (debounce), so that a partially written file is never decoded.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from mc1.codec import xcode
+
+EXTENSION = '.MCS'
+
+# inotify constants (see <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (followed by the name)
+
+
+def is_savefile(name):
+    return name.upper().endswith(EXTENSION)
+
+
+def _inotify(directory):
+    """
+    Start watching the directory with inotify.
+    :return: the inotify file descriptor, or None if inotify is not available
+    """
+    libc_name = ctypes.util.find_library('c')
+    if not libc_name:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _read_events(fd):
+    """
+    :return: set of the names of the modified save-files
+    """
+    names = set()
+    try:
+        buffer = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return names
+    position = 0
+    while position + _EVENT.size <= len(buffer):
+        _, _, _, length = _EVENT.unpack_from(buffer, position)
+        position += _EVENT.size
+        name = os.fsdecode(buffer[position:position + length].rstrip(b'\x00'))
+        position += length
+        if is_savefile(name):
+            names.add(name)
+    return names
+
+
+class Poller:
+    """
+    Polling fallback: detects the modified save-files with their mtime & size.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.dir_mtime = None
+        self.stats = {}  # save-file name => (mtime, size)
+        self.changed()  # initial state: no change reported
+
+    def _stat(self, name):
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def changed(self):
+        """
+        :return: set of the names of the save-files created or modified since the last call
+        """
+        names = set()
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        if dir_mtime != self.dir_mtime:  # save-files were created, renamed or deleted
+            self.dir_mtime = dir_mtime
+            for name in os.listdir(self.directory):
+                if is_savefile(name) and name not in self.stats:
+                    self.stats[name] = None
+        for name, previous in list(self.stats.items()):
+            current = self._stat(name)
+            if current is None:
+                del self.stats[name]
+            elif current != previous:
+                self.stats[name] = current
+                names.add(name)
+        return names
+
+
+def load_savefiles(directory):
+    """
+    Read & decode all the save-files of the directory (the initial state).
+    :return: dict save-file name => decoded content
+    """
+    decoded = {}
+    for name in os.listdir(directory):
+        if is_savefile(name):
+            try:
+                with open(os.path.join(directory, name), 'rb') as f:
+                    decoded[name] = xcode(f.read())
+            except OSError:
+                pass
+    return decoded
+
+
+def changed_offsets(old, new):
+    """
+    :return: list of the offsets whose value differ between 2 decoded contents (of the same length)
+    """
+    if old == new:
+        return []
+    return [offset for offset, (a, b) in enumerate(zip(old, new)) if a != b]
+
+
+def watch(directory, callback, settle=0.03, poll_interval=0.05, use_inotify=True):
+    """
+    Watch the directory, forever. 'callback(name, old, new)' is called for each written save-file,
+    with its previous decoded content ('old', None for a new save-file) and its new decoded content.
+    :param directory: directory of the save-files
+    :param settle: a save-file is read once it has not been modified for 'settle' seconds
+    :param poll_interval: seconds between 2 checks (polling only)
+    :param use_inotify: if False, always use the polling fallback
+    """
+    states = load_savefiles(directory)
+    fd = _inotify(directory) if use_inotify else None
+    poller = None
+    if fd is None:
+        poller = Poller(directory)
+        settle = max(settle, poll_interval)  # at least one more check must show that the save-file is complete
+    pending = {}  # save-file name => time of its last modification
+
+    try:
+        while True:
+            if pending:
+                timeout = max(0.0, min(pending.values()) + settle - time.monotonic())
+            else:
+                timeout = None if fd is not None else poll_interval
+
+            if fd is not None:
+                ready, _, _ = select.select([fd], [], [], timeout)
+                names = _read_events(fd) if ready else set()
+            else:
+                time.sleep(poll_interval if timeout is None else min(timeout, poll_interval))
+                names = poller.changed()
+
+            now = time.monotonic()
+            for name in names:
+                pending[name] = now
+
+            for name in [name for name, last in pending.items() if now - last >= settle]:
+                del pending[name]
+                try:
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        new = xcode(f.read())
+                except FileNotFoundError:
+                    states.pop(name, None)
+                    continue
+                old = states.get(name)
+                states[name] = new
+                callback(name, old, new)
+    finally:
+        if fd is not None:
+            os.close(fd)
@@ -1,13 +1,29 @@
 #!/usr/bin/python3
 from mmap import ACCESS_READ, mmap
-import operator
 import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1 import timings
+from mc1.codec import xcode
+from mc1.dump import dump, render_dump  # the decoder & the printing are shared with the other scripts (see mc1/)
+from mc1.watch import changed_offsets, watch
 
 """
 This script will decode a Magic Candle 1 save file.
 License: GPLv3
 
 USAGE:  python3 <script>  <save_file.MCS>
+        python3 <script>  --watch <game directory>
+
+--watch: keep running, and each time the game writes a save-file of the directory, print the rows of the
+save-file that changed since its previous version (same layout as mc1_diff_savefiles.py). Useful when the
+game runs in DOSBox next to the script: save in the game, the changes are displayed immediately.
+
+--timings: print the time spent in each phase (read, decode, format, print) and the bytes read, on STDERR.
+--timings-json FILE: the same as JSON. --profile out.prof: a cProfile capture. (see mc1/timings.py)
 
 MC1 allows 8 different save files labelled xxxxx1.mcs to xxxxx8.mcs
 where xxxxx is the name displayed when starting the game.
@@ -43,95 +59,52 @@ real_value = 'L', which is the letter L in uppercase (76th character in an ASCII
 """
 
 
-def dcode(byte_offset, byte_value):
+def print_changes(name, old, new, csv_friendly=False):
     """
-    Decode (or encode, the method is the same) the byte value located at the offset.
-    The offset is the byte number of the byte to decode/encode, starting from the beginning of the save-file.
-    '0xA5' is a magic number used by the game for the operation.
-    '& 0xFF' is used to keep only the byte value (prevents overflows)
-    :param byte_offset: offset of the byte that we are encoding/decoding (starting from the beginning of the file)
-    :param byte_value: encoding/decoding the byte located at the position 'offset' in the save-file
+    Print the changes of a save-file written by the game (see mc1/watch.py).
     """
-    return operator.xor((byte_offset + 0xA5), byte_value) & 0xFF
-
-
-parser = argparse.ArgumentParser(description='View the decoded save-file.')
-parser.add_argument('savefile', nargs='?', help='Name of the savefile (xxxxx.MCS)')
-parser.add_argument('--csv-friendly', action='store_true',
-                    help='Print the modified content of the save-file, with a "tab" separator')
-args = parser.parse_args()
-
-BLOCK_SIZE = 6  # When displaying the save-file, print BLOCK_SIZE cols/line. (6 because there are 6 heroes in the game)
-
-offset = 0  # Keep track of the current offset, starting from the beginning of the file
-
-# The separators used when printing the save-file. They must change if the file is used as a CSV file
-SEP_GROUPS = '\t'
-SEP_COLS = ' '
-SEP_CHARS = ''
-
-# Output is a CSV file: we use tabs as separators, they are the only safe choice.
-# ',' or ';' cannot be used, they may appear in the 'chars' column, which would
-# break the import from the CSV. While Tabs cannot appear in the output.
-if args.csv_friendly:
-    # SEP_GROUPS = '\t'
-    SEP_COLS = '\t'
-
-filename = args.savefile
-with open(filename, 'rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as mm:
-    SAVEFILE_LENGTH = len(mm)
-
-    curr_offset = 0  # Keep track of the current offset, starting from the beginning of the file
-    block = 0  # Counter used to separate the values in blocks of size 'BLOCK_SIZE'
-    line_offset = 0  # Offset of the first byte in a row (printed in the first column)
-
-    # The blocks to be displayed in the row. These arrays are initialized so that we don't need to bother tracking which
-    # must be padded with '_' characters when the number of displayed bytes is < BLOCK_SIZE.
-    # This will considerably simplify the Padding (see 'pad' below).
-    group_encoded_hexa = ["   _"] * BLOCK_SIZE  # Store encoded hexadecimal values
-    group_decoded_hexa = ["   _"] * BLOCK_SIZE  # Store decoded hexadecimal values
-    group_decoded_decimal = ["  _"] * BLOCK_SIZE  # Store decoded decimal values
-    group_chars = [""] * BLOCK_SIZE  # Store decoded values as characters (most won't make sense)
-
-    # [optional] the file is not always aligned in blocks of 'BLOCK_SIZE', 'pad' can be used to inject a new line to make reading the file easier.
-    # An underscore '_' char will be substituted as a padding character.
-    # This makes the final result look more regular (as well as easier to parse and document)
-    # Note that the pads below do not necessary make sense, on my test save-file they look good, but it
-    # is possible that some fields thought to be unused or related, have in fact another meaning...
-    # Content: the offsets that we want to start on a newline.
-    pad = {0x1cc, 0x1f1, 0x22c, 0x26f, 0x3a3, 0x430, 0x479}
-
-    for byte_mm in mm:
-        byte = byte_mm[0]
-        val = dcode(curr_offset, byte)  # => the decoding
-
-        curr_c = "{0:c}".format(val)
-        if not str(curr_c).isprintable():  # protection against special chars that create problems on the screen (beep, etc.)
-            curr_c = "."
-
-        group_encoded_hexa[block] = "{0:#04x}".format(byte)
-        group_decoded_hexa[block] = "{0:#04x}".format(val)
-        group_decoded_decimal[block] = "{0:>3}".format(val)
-        group_chars[block] = curr_c
-
-        # Print & newline when BLOCK_SIZE chars have been parsed or a PADDING/newline byte is reached or the end of file is reached
-        if ((block % (BLOCK_SIZE - 1) == 0) and (block > 0)) or (curr_offset in pad) or (
-                    curr_offset >= SAVEFILE_LENGTH - 1):
-            line_offset = "{0:#05x}".format(line_offset)
-
-            out_format = SEP_GROUPS.join(["{0:6}", "{1}", "{2}", "{3}", "{4}"])
-            out = out_format.format(line_offset, SEP_COLS.join(group_encoded_hexa),
-                                    SEP_COLS.join(group_decoded_hexa), SEP_COLS.join(group_decoded_decimal),
-                                    SEP_CHARS.join(group_chars))
-            print(out)
-            group_encoded_hexa = ["   _"] * BLOCK_SIZE
-            group_decoded_hexa = ["   _"] * BLOCK_SIZE
-            group_decoded_decimal = ["  _"] * BLOCK_SIZE
-            group_chars = [""] * BLOCK_SIZE
-            block = 0
-            line_offset = curr_offset + 1  # '+1' because this is the offset of the _next_ byte
+    from mc1.diff import render_step  # (NumPy is only needed by --watch)
+
+    header = "=== {0} {1}".format(time.strftime('%H:%M:%S'), name)
+    if old is None or len(old) != len(new):
+        out = header + " (new save-file) ===\n" + render_dump(xcode(new), new, csv_friendly)
+    else:
+        offsets = changed_offsets(old, new)
+        out = header + ": {0} byte(s) changed ===\n".format(len(offsets))
+        out += ''.join(line + '\n' for line in render_step(old, new, offsets, csv_friendly))
+    sys.stdout.write(out)
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='View the decoded save-file.')
+    parser.add_argument('savefile', nargs='?', help='Name of the savefile (xxxxx.MCS)')
+    parser.add_argument('--csv-friendly', action='store_true',
+                        help='Print the modified content of the save-file, with a "tab" separator')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='Print the changes of the save-files of the directory, each time they are written')
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if not args.watch and not args.savefile:
+        parser.print_usage()
+        return
+
+    with timings.instrumented(args):
+        if args.watch:
+            print("Watching the save-files of %s (Ctrl-C to stop)" % args.watch, file=sys.stderr)
+            try:
+                watch(args.watch, lambda name, old, new: print_changes(name, old, new, args.csv_friendly))
+            except KeyboardInterrupt:
+                pass
         else:
-            block += 1
+            filename = args.savefile
+            with open(filename, 'rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as mm:
+                with timings.phase('read'):
+                    data = bytes(mm)
+                timings.count('bytes_read', len(data))
+                dump(data, csv_friendly=args.csv_friendly)  # --csv-friendly: "tab" separators only (see mc1/dump.py)
 
-        curr_offset += 1
 
+if __name__ == '__main__':
+    main()
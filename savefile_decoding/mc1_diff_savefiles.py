@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.diff import change_summary, load_matrix, render_diff
+
+"""
+This script compares Magic Candle 1 save-files (snapshots of the same game, saved one after the other).
+License: GPLv3
+
+USAGE:  python3 <script> [--csv-friendly] [--context N] [--summary] <save_file1.MCS> <save_file2.MCS> [...]
+
+Useful for the 'modify/reload' reverse engineering: save the game, change something in the game (buy an item,
+gain a level...), save again, and see which bytes changed.
+
+For each step (snapshot N => snapshot N+1), the rows with changed values are printed with the same layout as
+mc1_decode_savefile.py (6 bytes/row):
+  offset, old values (hexa), new values (hexa), old values (decimal), new values (decimal), old chars, new chars
+The changed values are colored (except with --csv-friendly).
+
+--summary: instead of the rows, print one line per offset which changed at least once:
+  offset, number of steps where it changed, number of distinct values in the series
+
+Ex: python3 mc1_diff_savefiles.py SESSION/LUKAS1.MCS.* --summary
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare decoded save-files (snapshots).')
+    parser.add_argument('savefiles', nargs='+', metavar='XXXX.MCS',
+                        help='Snapshots, in chronological order (at least 2)')
+    parser.add_argument('--csv-friendly', action='store_true',
+                        help='Print the changes with a "tab" separator, no colors')
+    parser.add_argument('--context', type=int, default=0, metavar='N',
+                        help='Print N unchanged rows before/after the changed ones')
+    parser.add_argument('--summary', action='store_true',
+                        help='Only print the offsets which changed, with their number of changes')
+    args = parser.parse_args(argv)
+
+    if len(args.savefiles) < 2:
+        sys.exit("ERROR: at least 2 save-files are needed")
+
+    try:
+        matrix = load_matrix(args.savefiles)
+    except (OSError, ValueError) as e:
+        sys.exit("ERROR: %s" % e)
+
+    if args.summary:
+        sys.stdout.write(''.join("{0:#05x}\t{1}\t{2}\n".format(offset, changes, values)
+                                 for offset, changes, values in change_summary(matrix)))
+    else:
+        sys.stdout.write(render_diff(args.savefiles, matrix, args.csv_friendly, args.context))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.export import FORMATS, export, find_savefiles
+
+"""
+This script decodes all the Magic Candle 1 save-files of a directory tree, and exports them as a single table.
+License: GPLv3
+
+USAGE:  python3 <script> [--format csv|jsonl|npy] [--columns bytes|fields] -o <output> <directory or save-file> [...]
+
+One row per save-file, one column per offset (--columns bytes, the default) or per named field
+(--columns fields: strength_1 ... strength_6, gold_1, name_1, etc. see mc1/schema.py).
+
+Formats:
+  csv    "tab" separated values, with a header (the default)
+  jsonl  one JSON object per line/save-file
+  npy    NumPy matrix (uint8, one row per save-file), the names of the save-files are written
+         in <output>.files.txt (only with --columns bytes, all the save-files must have the same length)
+
+Ex: python3 mc1_export_savefiles.py --format npy -o corpus.npy archives/
+    then in Python: numpy.load('corpus.npy')[:, 0x1cd] => first letter of the first hero name, for every save-file
+
+The files are decoded & written one by one: the memory use stays flat, whatever the number of save-files.
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export many decoded save-files as a single table.')
+    parser.add_argument('paths', nargs='+', metavar='DIR',
+                        help='Directories (searched recursively for *.MCS) or save-files')
+    parser.add_argument('-o', '--output', required=True, help='Name of the output file')
+    parser.add_argument('--format', choices=FORMATS, default='csv', help='Output format (default: csv)')
+    parser.add_argument('--columns', choices=('bytes', 'fields'), default='bytes',
+                        help='One column per offset (bytes) or per named field (fields)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    savefiles = []
+    for path in args.paths:
+        savefiles += find_savefiles(path)
+
+    try:
+        rows = export(savefiles, args.output, args.format, args.columns,
+                      warn=lambda message: print(message, file=sys.stderr))
+    except ValueError as e:
+        sys.exit("ERROR: %s" % e)
+    print("{0} save-file(s) exported to {1} in {2:.2f} s".format(rows, args.output, time.perf_counter() - start),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.search import TYPES, load_state, next_snapshot, save_state, start_search, survivors
+
+"""
+This script finds which bytes of a Magic Candle 1 save-file hold a value ("cheat-engine" style search).
+License: GPLv3
+
+USAGE:  python3 <script> start --state STATE.npz [--types u8,u16,u32] [--eq X] <save_file.MCS>
+        python3 <script> next  --state STATE.npz (--eq X | --inc | --dec | --same | --changed | --delta D) <save_file.MCS>
+        python3 <script> show  --state STATE.npz [--limit N]
+
+Ex: to find the gold of the party (you have 120 gold pieces):
+    save the game                      => python3 <script> start --state gold.npz --eq 120 LUKAS1.MCS
+    buy something, save the game       => python3 <script> next --state gold.npz --dec LUKAS1.MCS
+    sell something, save the game      => python3 <script> next --state gold.npz --inc LUKAS1.MCS
+    ...
+    python3 <script> show --state gold.npz  => the surviving offsets (offset, type, last value)
+
+The values are read as little-endian unsigned integers (u8, u16, u32), at every offset.
+Each step only reads the surviving candidates (stored in the state file), the previous snapshots are never read again.
+"""
+
+
+def add_predicates(subparser):
+    group = subparser.add_mutually_exclusive_group()
+    group.add_argument('--eq', type=int, metavar='X', help='The value is X')
+    group.add_argument('--inc', action='store_true', help='The value increased')
+    group.add_argument('--dec', action='store_true', help='The value decreased')
+    group.add_argument('--same', action='store_true', help='The value did not change')
+    group.add_argument('--changed', action='store_true', help='The value changed')
+    group.add_argument('--delta', type=int, metavar='D', help='The value changed by D (ex: -20)')
+
+
+def get_predicate(args):
+    for predicate in ('inc', 'dec', 'same', 'changed'):
+        if getattr(args, predicate, False):
+            return predicate, None
+    if getattr(args, 'delta', None) is not None:
+        return 'delta', args.delta
+    if getattr(args, 'eq', None) is not None:
+        return 'eq', args.eq
+    return None, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find which bytes of the save-file hold a value.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    start_parser = subparsers.add_parser('start', help='Start a search with the first snapshot')
+    start_parser.add_argument('savefile', metavar='XXXX.MCS')
+    start_parser.add_argument('--state', required=True, metavar='STATE.npz', help='File storing the search')
+    start_parser.add_argument('--types', default=','.join(TYPES),
+                              help='Types of the values, comma separated (default: %s)' % ','.join(TYPES))
+    start_parser.add_argument('--eq', type=int, metavar='X', help='The value is X')
+
+    next_parser = subparsers.add_parser('next', help='Filter the candidates with a new snapshot')
+    next_parser.add_argument('savefile', metavar='XXXX.MCS')
+    next_parser.add_argument('--state', required=True, metavar='STATE.npz', help='File storing the search')
+    add_predicates(next_parser)
+
+    show_parser = subparsers.add_parser('show', help='Print the surviving candidates')
+    show_parser.add_argument('--state', required=True, metavar='STATE.npz', help='File storing the search')
+    show_parser.add_argument('--limit', type=int, default=100, metavar='N',
+                             help='Print at most N candidates (default: 100)')
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'start':
+            types = [t.strip() for t in args.types.split(',') if t.strip()]
+            unknown = [t for t in types if t not in TYPES]
+            if unknown:
+                sys.exit("ERROR: unknown type(s): %s (%s)" % (', '.join(unknown), ', '.join(TYPES)))
+            state = start_search(args.savefile, types, *get_predicate(args))
+            save_state(state, args.state)
+        elif args.command == 'next':
+            predicate, operand = get_predicate(args)
+            if predicate is None:
+                sys.exit("ERROR: a predicate is needed (--eq, --inc, --dec, --same, --changed or --delta)")
+            state = next_snapshot(load_state(args.state), args.savefile, predicate, operand)
+            save_state(state, args.state)
+        else:
+            state = load_state(args.state)
+            for offset, type_name, value in survivors(state, args.limit):
+                print("{0:#05x}\t{1}\t{2}".format(offset, type_name, value))
+    except (OSError, ValueError) as e:
+        sys.exit("ERROR: %s" % e)
+
+    print("{0} candidate(s) after {1} snapshot(s)".format(len(state['offsets']), len(state['snapshots'])),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
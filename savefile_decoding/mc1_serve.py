@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.server import serve
+
+"""
+This script starts a local HTTP/JSON server giving access to the decoded save-files & Tile files of
+"The Magic Candle 1". The files are decoded once and kept in memory (until they change).
+License: GPLv3
+
+USAGE:  python3 <script> [--tiles TILES_DIR] [--host HOST] [--port PORT] <save-files directory>
+
+Ex: python3 mc1_serve.py --tiles ~/dosbox/MC1/TILES ~/dosbox/MC1
+    curl http://127.0.0.1:8060/saves/LUKAS1.MCS/fields
+    curl --data-binary '0x90 200 0' http://127.0.0.1:8060/saves/LUKAS1.MCS/patch
+    curl -o tile.png http://127.0.0.1:8060/tiles/EGA17.TIL/5.png?scale=4
+
+The endpoints are described in mc1/server.py
+"""
+
+
+def started(addresses):
+    for address in addresses:
+        print("Serving on http://{0}:{1}/".format(*address[:2]), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local HTTP/JSON server for the decoded save-files & Tile files.')
+    parser.add_argument('directory', metavar='DIR', help='Directory of the save-files')
+    parser.add_argument('--tiles', metavar='TILES_DIR', help='Directory of the Tile files (default: DIR/TILES)')
+    parser.add_argument('--host', default='127.0.0.1', help='Listening address (default: 127.0.0.1, local only)')
+    parser.add_argument('--port', type=int, default=8060, help='Listening port (default: 8060)')
+    args = parser.parse_args(argv)
+
+    tiles_dir = args.tiles or os.path.join(args.directory, 'TILES')
+    for directory in (args.directory, tiles_dir):
+        if not os.path.isdir(directory):
+            sys.exit("ERROR: %s is not a directory" % directory)
+
+    try:
+        asyncio.run(serve(args.directory, tiles_dir, args.host, args.port, started))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.exit("ERROR: %s" % e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1 import timings
+from mc1.export import find_savefiles
+from mc1.snapshots import connect, ingest, query, statistics
+
+"""
+This script stores decoded Magic Candle 1 save-files in a SQLite database, and queries them.
+License: GPLv3
+
+USAGE:  python3 <script> ingest [--prune] <database> <directory or save-file> [...]
+        python3 <script> query [--count] [--limit N] <database> <predicate> [...]
+
+ingest: decode the save-files (the directories are searched recursively for *.MCS) and store them in the
+database. Identical save-files are stored once. Only the new or modified save-files are read (the others are
+skipped: same path, size & mtime), so ingesting the same directories again is fast.
+--prune: also forget the save-files which do not exist anymore.
+
+query: print the save-files matching all the predicates (one per argument, quote them for the shell):
+  gold > 5000          a named field of any hero (gold_1 ... gold_6, see mc1/schema.py) / gold_2 > 5000: the 2nd hero
+  name_1 = LUKAS       a text field
+  0x1cd = 'L'          the decoded byte at the offset 0x1cd (a character or a number: 0x1cd = 76)
+  0x90:u16 >= 5000     a little-endian value of 2 (u16) or 4 (u32) bytes
+  0x1cd = 'LUKAS'      the decoded bytes from 0x1cd
+Operators: = (or ==), !=, <, <=, >, >=
+
+Ex: python3 mc1_snapshots.py ingest saves.db archives/
+    python3 mc1_snapshots.py query saves.db "0x1cd = 'L'" "gold > 5000"
+
+The database is described in mc1/snapshots.py
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Store decoded save-files in a SQLite database, and query them.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='Add the new or modified save-files to the database')
+    ingest_parser.add_argument('database', metavar='DB', help='The SQLite database (created if needed)')
+    ingest_parser.add_argument('paths', nargs='+', metavar='DIR',
+                               help='Directories (searched recursively for *.MCS) or save-files')
+    ingest_parser.add_argument('--prune', action='store_true', help='Forget the save-files which do not exist anymore')
+    timings.add_arguments(ingest_parser)
+
+    query_parser = subparsers.add_parser('query', help='Print the save-files matching all the predicates')
+    query_parser.add_argument('database', metavar='DB', help='The SQLite database')
+    query_parser.add_argument('predicates', nargs='*', metavar='PREDICATE', help="Ex: 'gold > 5000' '0x1cd = L'")
+    query_parser.add_argument('--count', action='store_true', help='Only print the number of matching save-files')
+    query_parser.add_argument('--limit', type=int, metavar='N', help='Print at most N save-files')
+    timings.add_arguments(query_parser)
+
+    args = parser.parse_args(argv)
+    if args.command == 'query' and not os.path.isfile(args.database):
+        sys.exit("ERROR: %s does not exist (see the ingest command)" % args.database)
+
+    start = time.perf_counter()
+    with timings.instrumented(args):
+        try:
+            connection = connect(args.database)
+            if args.command == 'ingest':
+                savefiles = [savefile for path in args.paths for savefile in find_savefiles(path)]
+                counts = ingest(connection, savefiles, args.prune)
+                stats = statistics(connection)
+                print("{added} added, {updated} updated, {skipped} skipped, {removed} removed, {contents} new content(s)"
+                      .format(**counts), end='', file=sys.stderr)
+                print(" in {0:.3f} s => {1} save-files, {2} distinct contents, {3:.1f} MB".format(
+                    time.perf_counter() - start, stats['files'], stats['contents'], stats['database'] / 1e6),
+                    file=sys.stderr)
+            else:
+                paths = query(connection, args.predicates, None if args.count else args.limit)
+                if args.count:
+                    print(len(paths))
+                else:
+                    sys.stdout.write(''.join(path + '\n' for path in paths))
+                print("{0} save-file(s) in {1:.3f} s".format(len(paths), time.perf_counter() - start), file=sys.stderr)
+            connection.close()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            sys.exit("ERROR: %s" % e)
+
+
+if __name__ == '__main__':
+    main()
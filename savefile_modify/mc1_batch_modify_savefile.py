@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.batch import expand_savefiles, patch_savefiles
+from mc1.editscript import compile_script
+from mc1.patch import PatchError
+
+"""
+This script applies the same modifications to many Magic Candle 1 save-files at once.
+
+License: GPLv3
+
+Usage: mc1_batch_modify_savefile.py [-h] [--script EDITS.txt] [--out-dir DIR] [-j N]
+                                    XXXX.MCS [XXXX.MCS ...]
+
+positional arguments:
+  XXXX.MCS              Save-files to modify, or glob patterns (ex: 'saves/**/*.MCS')
+
+optional arguments:
+  -h, --help            show this help message and exit
+  --script EDITS.txt    File containing the edit script (one modification per line)
+                        Ex: 0x2A3 12 70 50 (default: read from STDIN)
+  --out-dir DIR         Write the modified save-files in this directory (the directory tree of the
+                        save-files is mirrored). By default, the save-files are modified (after a backup).
+  -j N, --jobs N        Number of processes (default: number of CPUs)
+
+The edit script has the format of the '--stdin' option of mc1_modify_savefile.py (offset/values lines,
+fill, copy, heroes, text, name, '#' comments: see mc1/editscript.py). It is compiled once (only the copies
+inside a save-file are replayed on each save-file), then applied to all the save-files by a pool of
+processes. Each save-file is modified as a transaction (see mc1_modify_savefile.py): an invalid save-file
+(ex: too short for the modifications) is reported and left untouched, the other ones are modified.
+
+Example (Linux console):
+echo 0x0 99 99 99 99 99 99 | python3 mc1_batch_modify_savefile.py 'archives/**/*.MCS' --out-dir buffed/
+=> sets the current STRENGTH of the 6 heroes to 99 in all the archived save-files
+
+Output: one line per save-file (OK/FAILED, elapsed time), then a summary.
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply the same modifications to many save-files.')
+    parser.add_argument('savefiles', nargs='+', metavar='XXXX.MCS',
+                        help="Save-files to modify, or glob patterns (ex: 'saves/**/*.MCS')")
+    parser.add_argument('--script', metavar='EDITS.txt',
+                        help='File containing the edit script (one modification per line) Ex: 0x2A3 12 70 50 '
+                             '(default: read from STDIN)')
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='Write the modified save-files in this directory (default: modify the save-files)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N', help='Number of processes (default: number of CPUs)')
+    args = parser.parse_args(argv)
+
+    savefiles = expand_savefiles(args.savefiles)
+    if not savefiles:
+        sys.exit("ERROR: no save-file matches %s" % ' '.join(args.savefiles))
+
+    # Compile the edit script once, for all the save-files (read line by line)
+    length = max([os.path.getsize(savefile) for savefile in savefiles if os.path.isfile(savefile)], default=0)
+    try:
+        if args.script:
+            with open(args.script) as f:
+                script = compile_script(f, length)
+        else:
+            script = compile_script(sys.stdin, length)
+    except OSError as e:
+        sys.exit("ERROR: %s" % e)
+    except PatchError as e:
+        sys.exit("ERROR: %s\nNo save-file has been modified." % e)
+
+    start = time.perf_counter()
+    failed = 0
+    for savefile, error, elapsed in patch_savefiles(savefiles, script, args.out_dir, args.jobs):
+        if error:
+            failed += 1
+            print("FAILED  {0} ({1:.1f} ms): {2}".format(savefile, elapsed * 1000, error))
+        else:
+            print("OK      {0} ({1:.1f} ms)".format(savefile, elapsed * 1000))
+
+    print("{0} save-file(s) modified, {1} failed, in {2:.2f} s".format(len(savefiles) - failed, failed,
+                                                                         time.perf_counter() - start))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
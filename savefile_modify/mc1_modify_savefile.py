@@ -1,11 +1,15 @@
 #!/usr/bin/python3
-import mmap
-import operator
+import itertools
 import os
 import argparse
 import sys
-import shutil
-import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1 import timings
+from mc1.backups import current_version, load_history, restore, undo
+from mc1.dump import dump  # the decoder & the printing are shared with the other scripts (see mc1/)
+from mc1.editscript import run_script
+from mc1.patch import PatchError, apply_runs, modified_offsets, save_patched
 
 """
 This script allows the modification of byte values in a Magic Candle 1 save-file.
@@ -14,9 +18,11 @@ It can be used to change names, stats, weapons, money, etc.
 License: GPLv3
 
 Usage: mc1_modify_savefile.py [-h] -f XXXX.MCS [--dump] [--color-dump]
-                              [--out new.MCS]
+                              [--changes-only [N]] [--out new.MCS]
                               [-m offset byte1 byte2 byte3 [offset byte1 byte2 byte3 ...]]
                               [--stdin] [--csv-friendly]
+                              [--timings] [--timings-json FILE] [--profile out.prof]
+       mc1_modify_savefile.py -f XXXX.MCS (--history | --undo [N] | --restore ID) [--out old.MCS]
 
 Modify the save-file by changing some byte values at the specified offsets.
 
@@ -27,12 +33,18 @@ optional arguments:
   --dump                Print the modified content of the save-file
   --color-dump          Print the modified content of the save-file, with the
                         modified bytes colored
+  --changes-only [N]    With --dump/--color-dump: only print the rows with
+                        modified bytes, plus N rows before/after them
   --out new.MCS         Name of the modified savefile
   -m offset byte1 byte2 byte3 [offset byte1 byte2 byte3 ...], --modify offset byte1 byte2 byte3 [offset byte1 byte2 byte3 ...]
                         List of offset/values to modify Ex: 0x1A3 12 70 50 1
   --stdin               Read from STDIN a list of offset/values to modify (one per line) Ex: 0x2A3 12 70 50
   --csv-friendly        Print the modified content of the save-file, with a
                         "tab" separator
+  --history             Print the versions of the save-file (its modifications)
+  --undo [N]            Restore the save-file as it was N modifications ago
+                        (default: 1)
+  --restore ID          Restore a version of the save-file (see --history)
 
 Example (Linux console):
 echo 0x0 1 1 1 1 1 1 | python3 mc1_modify_savefile.py -f xxxxx.MCS --stdin --out out.MCS -m 0xf 99 99 99 -m 0xff 55 55
@@ -40,6 +52,28 @@ echo 0x0 1 1 1 1 1 1 | python3 mc1_modify_savefile.py -f xxxxx.MCS --stdin --out
    and the 3 bytes starting from the 15th (set to '99')
    and the 2 bytes starting from the 255th (set to '55')
 
+The modifications are all-or-nothing: every line is checked before the save-file is touched,
+and an invalid line (bad offset or value, offset bigger than the file, etc.) cancels the whole
+modification. The save-file is rewritten in a single write (temporary file + rename).
+
+Besides the offset/values lines, the edit script (-m or --stdin) accepts these operations (see mc1/editscript.py):
+  fill 0x1A3 16 0            the 16 bytes from 0x1A3 become 0
+  copy 0x1A3 0x200 16 [X.MCS]  the 16 bytes from 0x1A3 become the 16 bytes from 0x200 (of the save-file X.MCS)
+  heroes gold 5000           a field (or an offset) of the 6 heroes: one value for all, or 6 values (one per hero)
+  text 0x47A "CASTLE      "  characters
+  name 1 LUKAS               the name of a hero (1-6), its length is modified too
+Ex: printf 'heroes strength 30\nname 2 BOB\n' | python3 mc1_modify_savefile.py -f xxxxx.MCS --stdin
+
+When the save-file itself is modified (no --out), the modification is recorded in its history (hidden
+directory '.mc1_backups', next to the save-file, see mc1/backups.py): only the modified bytes are stored, and
+any version can be restored (--undo, --restore; with --out, the version is written in a new file).
+Ex: python3 mc1_modify_savefile.py -f xxxxx.MCS --history
+    python3 mc1_modify_savefile.py -f xxxxx.MCS --undo
+
+--timings: print the time spent in each phase (read, parse, merge, encode, backup, write...), the bytes read &
+written and the files produced, on STDERR. --timings-json FILE: the same as JSON. --profile out.prof: a cProfile
+capture. (see mc1/timings.py)
+
 WARNING:
 --------
 The changed bytes are not visible as such in the save-file, remember, the file is encoded!
@@ -84,185 +118,121 @@ real_value = 76 (in decimal)
 real_value = 'L', which is the letter L in uppercase (76th character in an ASCII table)
 """
 
-BLOCK_SIZE = 6  # When displaying the save-file, print BLOCK_SIZE cols/line. (6 because there are 6 heroes in the game)
-COLORED_START = "\033[1;36m"  # ASCII code used when displaying the modified bytes in color
-COLORED_END = "\033[1;m"  # ASCII code used when displaying the modified bytes in color
 
-
-def memory_map(filename):  # access=mmap.ACCESS_WRITE):
+def history_command(args):
     """
-    Put the whole save-file in memory.
-    The bytes can then be accessed as an array.
+    --history, --undo & --restore (see mc1/backups.py)
     """
-    fd = os.open(filename, os.O_RDWR)
-    fmm = mmap.mmap(fd, 0)
-    return fmm
+    try:
+        if args.history:
+            history = load_history(args.savefile)
+            if not history:
+                print("No history for %s (it has not been modified in place)" % args.savefile)
+            with open(args.savefile, 'rb') as f:
+                current = current_version(history, f.read())  # marked with a '*'
+            for version in history:
+                if 'restored' in version:
+                    description = "restored version %d" % version['restored']
+                elif version['parent'] is None:
+                    description = "content of the save-file before a modification"
+                else:
+                    description = "%d modified byte(s)" % sum(len(old) // 2 for _, old, _ in version['runs'])
+                print("{0:5}{1} {2}  {3}".format(version['id'], '*' if version is current else ' ',
+                                                 version['date'], description))
+            return
+        if args.undo is not None:
+            if args.undo < 1:
+                sys.exit("ERROR: --undo must be positive")
+            version = undo(args.savefile, args.undo, args.out)
+        else:
+            version = restore(args.savefile, args.restore, args.out)
+    except (OSError, ValueError) as e:
+        sys.exit("ERROR: %s" % e)
+    print("Version {0} ({1}) restored in {2}".format(version['id'], version['date'], args.out or args.savefile))
 
 
-def dump(mm, offset_list_to_color=[], colored_output=False):
+def modify(args):
     """
-    Print the modified content of the save-file. Optionally, with the modified bytes colored.
-    :param mm: memory-map of the save-file (allows direct modification)
-    :param offset_list_to_color: list of modified offsets
-    :param colored_output: if True then the values at the modified offsets (from offset_list_to_color) are displayed with an ASCII color
-    :return: nothing
+    Apply the modifications (-m & --stdin) to the save-file.
     """
-    curr_offset = 0  # Keep track of the current offset, starting from the beginning of the file
-    block = 0  # Counter used to separate the values in blocks of size 'BLOCK_SIZE'
-    line_offset = 0  # Offset of the first byte in a row (printed in the first column)
-
-    # The blocks to be displayed in the row. These arrays are initialized so that we don't need to bother tracking which
-    # must be padded with '_' characters when the number of displayed bytes is < BLOCK_SIZE.
-    # This will considerably simplify the Padding (see 'pad' below).
-    group_encoded_hexa = ["   _"] * BLOCK_SIZE  # Store encoded hexadecimal values
-    group_decoded_hexa = ["   _"] * BLOCK_SIZE  # Store decoded hexadecimal values
-    group_decoded_decimal = ["  _"] * BLOCK_SIZE  # Store decoded decimal values
-    group_chars = [""] * BLOCK_SIZE  # Store decoded values as characters (most won't make sense)
-
-    # [optional] the file is not always aligned in blocks of 'BLOCK_SIZE', 'pad' can be used to inject a new line to make reading the file easier.
-    # An underscore '_' char will be substituted as a padding character.
-    # This makes the final result look more regular (as well as easier to parse and document)
-    # Note that the pads below do not necessary make sense, on my test safe-file they look good, but it
-    # is possible that some fields thought to be unused or related, have in fact another meaning...
-    # Content: the offsets that we want to start on a newline.
-    pad = {0x1cc, 0x1f1, 0x22c, 0x26f, 0x3a3, 0x430, 0x479}
-
-    for byte_mm in mm:
-        byte = byte_mm[0]
-        val = dcode(curr_offset, byte)  # => the decoding
-
-        curr_c = "{0:c}".format(val)
-        if not str(curr_c).isprintable():  # protection against special chars that create problems on the screen (beep, etc.)
-            curr_c = "."
-
-        if colored_output and curr_offset in offset_list_to_color:
-            group_encoded_hexa[block] = COLORED_START + "{0:#04x}".format(byte) + COLORED_END
-            group_decoded_hexa[block] = COLORED_START + "{0:#04x}".format(val) + COLORED_END
-            group_decoded_decimal[block] = COLORED_START + "{0:>3}".format(val) + COLORED_END
-            group_chars[block] = COLORED_START + curr_c + COLORED_END
+    # Load the save-file in memory
+    try:
+        with timings.phase('read'):
+            with open(args.savefile, 'rb') as f:
+                original = savefile_data = f.read()
+    except OSError as e:
+        sys.exit("ERROR: cannot read the save-file %s (%s)" % (args.savefile, e.strerror))
+    timings.count('bytes_read', len(original))
+
+    # Apply all the modifications to a decoded copy first: '-m' option(s), then STDIN (one modification per line,
+    # read by chunks: the script is never loaded whole). An invalid line cancels everything (see mc1/editscript.py)
+    modification_lines = itertools.chain(args.modify or [], sys.stdin if args.stdin else [])
+    try:
+        runs = run_script(savefile_data, modification_lines)
+    except PatchError as e:
+        sys.exit("ERROR: %s\nThe save-file has not been modified." % e)
+
+    # The modified bytes are merged in contiguous runs, encoded & applied in bulk
+    savefile_data = apply_runs(savefile_data, runs)
+
+    # Store the offsets of all the modified values (a set: the dump checks each displayed offset against it).
+    # Used to display them in color when the '--color-dump' option is enabled.
+    offsets = modified_offsets(runs)
+
+    # [option] print the content of the modified save-file
+    if args.dump or args.color_dump:
+        # [option] print only the modified rows (+ some context)
+        changes = offsets if args.changes_only is not None else None
+        if args.csv_friendly:  # no colors! the console chars used to display colors would break the CSV file.
+            dump(savefile_data, csv_friendly=True, changes=changes, context=args.changes_only)
+        elif args.color_dump:
+            dump(savefile_data, highlight=offsets, changes=changes, context=args.changes_only)
         else:
-            group_encoded_hexa[block] = "{0:#04x}".format(byte)
-            group_decoded_hexa[block] = "{0:#04x}".format(val)
-            group_decoded_decimal[block] = "{0:>3}".format(val)
-            group_chars[block] = curr_c
-
-        # Print & newline when BLOCK_SIZE chars have been parsed or a PADDING/newline byte is reached or the end of file is reached
-        if ((block % (BLOCK_SIZE - 1) == 0) and (block > 0)) or (curr_offset in pad) or (curr_offset >= SAVEFILE_LENGTH - 1):
-            line_offset = "{0:#05x}".format(line_offset)
-
-            out_format = SEP_GROUPS.join(["{0:6}", "{1}", "{2}", "{3}","{4}"])
-            out = out_format.format(line_offset, SEP_COLS.join(group_encoded_hexa),
-                                                     SEP_COLS.join(group_decoded_hexa), SEP_COLS.join(group_decoded_decimal),
-                                                     SEP_CHARS.join(group_chars))
-            print(out)
-            group_encoded_hexa = ["   _"] * BLOCK_SIZE
-            group_decoded_hexa = ["   _"] * BLOCK_SIZE
-            group_decoded_decimal = ["  _"] * BLOCK_SIZE
-            group_chars = [""] * BLOCK_SIZE
-            block = 0
-            line_offset = curr_offset + 1  # '+1' because this is the offset of the _next_ byte
+            dump(savefile_data, changes=changes, context=args.changes_only)
+
+    # Write modification to disk (a temporary file replaces the save-file once it is complete)
+    # If the save-file is directly modified, it is first backed up (see mc1/patch.py)
+    try:
+        save_patched(args.savefile, savefile_data, args.out, original, runs)
+    except (OSError, ValueError) as e:  # ex: a corrupted history (see mc1/backups.py)
+        sys.exit("ERROR: %s\nThe save-file has not been modified." % e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Modify the save-file by changing some byte values at the specified offsets.')
+    parser.add_argument('-f', '--savefile', metavar='XXXX.MCS', help='Name of the savefile (xxxxx.MCS)', required=True)
+    parser.add_argument('--dump', action='store_true', help='Print the modified content of the save-file')
+    parser.add_argument('--color-dump', action='store_true',
+                        help='Print the modified content of the save-file, with the modified bytes colored')
+    parser.add_argument('--changes-only', type=int, nargs='?', const=0, metavar='N',
+                        help='With --dump/--color-dump: only print the rows with modified bytes, '
+                             'plus N rows before/after them')
+    parser.add_argument('--out', metavar='new.MCS', help='Name of the modified savefile')
+    parser.add_argument('-m', '--modify', action='append', nargs='+', metavar='offset byte1 byte2 byte3',
+                        help='List of offset/values to modify Ex: 0x1A3 12 70 50 1')
+    parser.add_argument('--stdin', action='store_true',
+                        help='Read from STDIN a list of offset/values to modify (one per line) Ex: 0x2A3 12 70 50')
+    parser.add_argument('--csv-friendly', action='store_true',
+                        help='Print the modified content of the save-file, with a "tab" separator')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--history', action='store_true', help='Print the versions of the save-file (its modifications)')
+    group.add_argument('--undo', type=int, nargs='?', const=1, metavar='N',
+                       help='Restore the save-file as it was N modifications ago (default: 1)')
+    group.add_argument('--restore', type=int, metavar='ID', help='Restore a version of the save-file (see --history)')
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+    # print(args)
+
+    if (args.history or args.undo is not None or args.restore is not None) and (args.modify or args.stdin):
+        sys.exit("ERROR: --history, --undo & --restore cannot be used with modifications")
+
+    with timings.instrumented(args):
+        if args.history or args.undo is not None or args.restore is not None:
+            history_command(args)
         else:
-            block += 1
-
-        curr_offset += 1
+            modify(args)
 
 
-def dcode(byte_offset, byte_value):
-    """
-    Decode (or encode, the method is the same) the byte value located at the offset.
-    The offset is the byte number of the byte to decode/encode, starting from the beginning of the save-file.
-    '0xA5' is a magic number used by the game for the operation.
-    '& 0xFF' is used to keep only the byte value (prevents overflows)
-    :param byte_offset: offset of the byte that we are encoding/decoding (starting from the beginning of the file)
-    :param byte_value: encoding/decoding the byte located at the position 'offset' in the save-file
-    """
-    return operator.xor((byte_offset + 0xA5), byte_value) & 0xFF
-
-
-parser = argparse.ArgumentParser(description='Modify the save-file by changing some byte values at the specified offsets.')
-parser.add_argument('-f', '--savefile', metavar='XXXX.MCS', help='Name of the savefile (xxxxx.MCS)', required=True)
-parser.add_argument('--dump', action='store_true', help='Print the modified content of the save-file')
-parser.add_argument('--color-dump', action='store_true',
-                    help='Print the modified content of the save-file, with the modified bytes colored')
-parser.add_argument('--out', metavar='new.MCS', help='Name of the modified savefile')
-parser.add_argument('-m', '--modify', action='append', nargs='+', metavar='offset byte1 byte2 byte3',
-                    help='List of offset/values to modify Ex: 0x1A3 12 70 50 1')
-parser.add_argument('--stdin', action='store_true',
-                    help='Read from STDIN a list of offset/values to modify (one per line) Ex: 0x2A3 12 70 50')
-parser.add_argument('--csv-friendly', action='store_true',
-                    help='Print the modified content of the save-file, with a "tab" separator')
-args = parser.parse_args()
-# print(args)
-
-# The separators used when printing the save-file. They must change if the file is used as a CSV file
-SEP_GROUPS = '\t'
-SEP_COLS = ' '
-SEP_CHARS = ''
-
-# Output is a CSV file: we use tabs as separators, they are the only safe choice.
-# ',' or ';' cannot be used, they may appear in the 'chars' column, which would
-# break the import from the CSV. While Tabs cannot appear in the output.
-if args.csv_friendly:
-    SEP_GROUPS = '\t'
-    SEP_COLS = '\t'
-
-# Load the save-file in memory
-if args.out:
-    shutil.copyfile(args.savefile, args.out)
-    savefile_mm = memory_map(args.out)
-else:
-    # Directly modify the save-file => first backup it
-    suffix = time.strftime('%Y%m%d-%H%M%S')
-    shutil.copyfile(args.savefile, args.savefile + "_" + suffix)
-    savefile_mm = memory_map(args.savefile)
-
-SAVEFILE_LENGTH = len(savefile_mm)
-
-# Store a list of offsets of all the modified values.
-# Used to display them in color when the '--color-dump' option is enabled.
-offsets = []
-
-# [option] read offset/values blocks from the '-m' option
-if args.modify:
-    for modification_group in args.modify:
-        if len(modification_group) > 1:
-            offset = int(modification_group[0], 16)
-            if offset > SAVEFILE_LENGTH:
-                print("WARNING: The offsets from this line (%s) are bigger than the length of the file (%s)! Please check them." % (
-                      modification_group, hex(SAVEFILE_LENGTH)))
-            else:
-                for new_val in modification_group[1:]:
-                    savefile_mm[offset] = dcode(offset, int(new_val))
-                    offsets.append(offset)
-                    offset += 1
-
-# [option] read offset/values blocks from STDIN
-if args.stdin:
-    lines = sys.stdin.readlines()
-
-    for line in lines:
-        vals = line.rstrip().split()
-        if len(vals) > 1:
-            offset = int(vals[0], 16)
-            if offset > SAVEFILE_LENGTH:
-                print("WARNING: The offsets from this line (%s) are bigger than the length of the file (%s)! Please check them." % (
-                      line.rstrip(), hex(SAVEFILE_LENGTH)))
-            else:
-                for new_val in vals[1:]:
-                    savefile_mm[offset] = dcode(offset, int(new_val))
-                    offsets.append(offset)
-                    offset += 1
-
-# [option] print the content of the modified save-file
-if args.dump or args.color_dump:
-    if args.csv_friendly:  # no colors! the console chars used to display colors would break the CSV file.
-        dump(savefile_mm)
-    else:
-        dump(savefile_mm, offsets, args.color_dump)
-
-# Write modification to disk
-flush_code = savefile_mm.flush()
-if flush_code != 0:
-   print("ERROR (%d) while writinging the save-file " % flush_code)
-else:
-    savefile_mm.close()
+if __name__ == '__main__':
+    main()
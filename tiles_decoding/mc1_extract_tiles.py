@@ -11,104 +11,56 @@ Utility for the game "The Magic Candle 1", 1989 MS-DOS version (320x200, 16 colo
   for better readability on modern screens) The PNG files are saved in the
   tile directory.
 
-USAGE:  ./mc1_extract_tiles.py <EGAxxx.TIL>   (the script must be executable)
-        or python3 ./mc1_extract_tiles.py <EGAxxx.TIL>
+USAGE:  ./mc1_extract_tiles.py <EGAxxx.TIL> [<EGAyyy.TIL> ...]   (the script must be executable)
+        or python3 ./mc1_extract_tiles.py <EGAxxx.TIL> [<EGAyyy.TIL> ...]
+        ./mc1_extract_tiles.py --atlas [-o ATLAS.png] [--columns N] [--scale N] <EGAxxx.TIL> [<EGAyyy.TIL> ...]
+        ./mc1_extract_tiles.py [--atlas] [--out-dir DIR] [--jobs N] [--force] <TILES directory>
+        ./mc1_extract_tiles.py --halfblock [--columns N] <EGAxxx.TIL> [<EGAyyy.TIL> ...]
+        ./mc1_extract_tiles.py --header <EGAxxx.TIL> [<EGAyyy.TIL> ...]
 Ex:     ./mc1_extract_tiles.py TILES/EGA17.TIL
+        ./mc1_extract_tiles.py --atlas TILES/EGA17.TIL             => TILES/EGA17.TIL__atlas.png (& .json)
+        ./mc1_extract_tiles.py --atlas -o all.png TILES/EGA*.TIL   => all the tiles in all.png (& all.json)
+        ./mc1_extract_tiles.py TILES/                              => all the Tile files of the directory
+
+--atlas: nothing is displayed, the tiles are packed in a single palette-indexed PNG sheet (one per Tile file,
+or one for all the Tile files if the name of the sheet is given) instead of one PNG per tile.
+A JSON index gives the position (x, y, w, h) & the source offset of each tile in the sheet.
+
+--halfblock: only a compact preview of the tiles is displayed (nothing is written): 2 pixels per character,
+with the exact colors (24-bit escape codes, see mc1/console.py), --columns tiles per row.
+
+Directory (batch mode): nothing is displayed but the progress, the Tile files are extracted by a pool of
+processes (--jobs), in the directory or in --out-dir. Only the Tile files which changed since the last run
+are extracted (see mc1/extract.py, the manifest is written in the output directory), unless --force is used.
+
+--timings: print the time spent in each phase (header, unpack, console, image, png...), the bytes read & written
+and the files produced, on STDERR. --timings-json FILE: the same as JSON. --profile out.prof: a cProfile capture.
+(see mc1/timings.py)
 
 Pb with the console output: the colors are limited (8 usually) & difficult to use.
 If your console works fine, each color can have a normal & "bold" or brighter option.
 If not, they will look bad on your screen. In that case, check the generated PNG...
 => If you don't know the intricaties of the Escape Codes, don't bother.
 (The Console colors can only be approximated, only the PNG are correct.)
+
+The TIL file format is described in mc1/tiles.py
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 """
+import argparse
+import os
 import sys
-from mmap import ACCESS_READ, mmap
-from PIL import Image, ImageDraw
+import time
 
-"""
-==========================================
-The TIL file format
-==========================================
-0-0xFF: header
-   The header is an array of 128 2-bytes blocks (BIG-endian),
-   each of them contain the offset of the first byte of a tile.
-   This means that each file contains a maximum of 128 tiles.
-   If an offset is 0xffff, this means that the rest of
-   the header is not used (all the next ones are 0xffff).
-
-0x100-0x101: padding/separator
-
-+ TILE block 0: 8*14 (pixels) + 2 (padding) => 114 bytes per tile
-     0x00-0x07: line 1 (16 pixels!, 2 colors packed in each byte)
-     ...
-     0x62-0x69: line 14
-     0x70-0x71: padding/separator
-+ TILE block 1
-   ...
-   etc (N tiles)
-   ...
-+ TILE block N: last tile of the file
-     0x00-0x07: line 1
-     ...
-     0x62-0x69: line 14
-     0x70-0x71: padding/separator
-0x??-EOF: some empty bytes (0x00) at the end, padding?, unknown usage
-==========================================
-"""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+# the tile decoder (& the TIL file format) is in mc1/tiles.py
+from mc1.extract import extract_directories, find_tilefiles
+from mc1 import timings
+from mc1.tiles import TileFile, colors, import_libraries, save_atlas, save_png, tile_image
 
-# Tiles are 16x14 pixels (but only use 8x14 bytes)
-tile_packed_w = 8  # 8 bytes/line
-tile_width = tile_packed_w * 2  # each byte of a line packs 2 pixels (1 pixel/nibble) => 16 pixels
-tile_height = 14
+tile_packed_w = 8  # Tiles are 16x14 pixels (but only use 8x14 bytes: 8 bytes/line)
 
 scale_factor = 2  # we'll scale up the PNG images, the original 16x14 size is too small on a modern screen
 
-group_hexa = ''  # stores Hex values of a tile (for console display)
-group_esc_codes = ''  # stores Escape Codes (for Console display)
-num_line = 0  # used to identify each tile line
-
-# Match the Tile file value with the ASCII colors (for console display)
-# & the EGA color for the generated tile files.
-# Key: value read from the file (16 values corresponding to the EGA 16 colors mode)
-#    => Values: console escape code, color name, (RGB value)
-#       The console values appear _twice_ because their brightness is.
-#       given as another parameter (not intuitive if you don't know this format)
-#       Their colors are _approximated_ only!
-#       See usage in the code below.
-colors = {
-    0x0: (30, "Black", (0, 0, 0)),
-    0x1: (34, "Blue", (0, 0, 170)),
-    0x2: (32, "Green", (0, 170, 0)),
-    0x3: (36, "Cyan", (0, 170, 170)),
-    0x4: (31, "Red", (170, 0, 0)),
-    0x5: (35, "Magenta", (170, 0, 170)),
-    0x6: (33, "Yellow", (170, 85, 0)),
-    0x7: (37, "White/Light Grey", (170, 170, 170)),
-
-    0x8: (30, "Dark Grey", (85, 85, 85)),
-    0x9: (34, "Highlighted Blue", (85, 85, 255)),
-    0xa: (32, "Highlighted Green", (85, 255, 85)),
-    0xb: (36, "Highlighted Cyan", (85, 255, 255)),
-    0xc: (31, "Highlighted Red", (255, 85, 85)),
-    0xd: (35, "Highlighted Magenta", (255, 85, 255)),
-    0xe: (33, "Highlighted yellow", (255, 255, 85)),
-    0xf: (37, "White", (255, 255, 255))
-}
-
-tile_array = []  # stores a TILE (2 dimensional array)
-line_array = []  # temp storage for one line/row of the Tile
-
-skip = 0x102  # used to skip useless (?) bytes. Initialized to 0x102 to ignore the header
-
-tiles_offset = []
-tiles_offset_row = []
-block = 0
-tmp_val = 0
-num_tile = 0  # we display each tile number before its extracted data
-finished = False
-offset = -2  # file offset (displayed in HEXadecimal on the console)
-
 
 # Get the Escape color codes for displaying on the console
 def get_esc_color_codes(pixel_color):
@@ -124,93 +76,144 @@ def get_esc_color_codes(pixel_color):
     return pixel
 
 
-print("=========== Displaying the HEADER table ===========")
-# Get filename from prompt (we don't check for errors!)
-filename = sys.argv[1]
-with open(filename, "rb") as f:
-    while True:
-        byte = f.read(2)  # each pair of bytes gives a TILE offset
-        offset += 2
+# The console output of the 16 colors, computed once
+console_pixels = [get_esc_color_codes(pixel_color) for pixel_color in range(16)]
+hexa_values = ["{0:#04x}".format(pixel_color) for pixel_color in range(16)]
 
-        if not byte:
-            break
-        val = byte[0] + (byte[1] * 256)  # compute the tile offset
 
-        if offset > 0xff:  # the header is always 256 (0xff) bytes long
-            break
+def print_header(tiles_offset):
+    with timings.phase('console'):
+        print("=========== Displaying the HEADER table ===========")
+        for num_tile in range(0, len(tiles_offset), 4):  # 4 tile offsets per line
+            group_hexa = ' '.join(["{0:#06x}".format(v) for v in tiles_offset[num_tile:num_tile + 4]])
+            print("{0:6}: {1}".format(hex(num_tile * 2), group_hexa))
 
-        if finished or ((block % 4 == 0) and (block > 0)):
-            line_offset = hex(offset - 8)
-            tiles_offset_row = map((lambda v: "{0:#06x}".format(v + 0xff + 3)), tiles_offset_row)
-            group_hexa = ' '.join(tiles_offset_row)
 
-            out = "{0:6}: {1}".format(line_offset, group_hexa)
-            print(out)
+def extract_tiles(filename, scale_factor=scale_factor):
+    """
+    Display the header & the tiles of a Tile file, and save each tile as a PNG file.
+    """
+    with TileFile(filename) as tile_file:
+        tiles_offset = tile_file.offsets
+        print_header(tiles_offset)
 
-            tiles_offset_row = []
-            if finished:
-                break
+        print("\n=========== Displaying the TILES ===========\n")
 
-        if val == 0xFFFF:  # the next offset will all be 0xffff => no tiles
-            finished = True
-        else:
-            tiles_offset_row.append(val)
-            tiles_offset.append(val + 0xff + 3)  # '+0xff' = skip header, '+3' = skip 2 padding chars after header
-            num_tile += 1
-            block += 1
-
-print("\n=========== Displaying the TILES ===========\n")
-
-num_tile = -1  # number of tile (in sequence as read from the file)
-
-# We load the whole file in memory, then we can access the bytes directly.
-with open(filename, 'rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as mm:
-    for tile_start_offset in tiles_offset:
-        num_tile += 1
-
-        print("======= {0}/{1} ======= ".format(num_tile + 1, len(tiles_offset)))
-        tile_pixels = []  # contains ONE tile
-        tile_pixels_row = []  # unpacked
-        pix_offset = 0
-
-        #
-        for d1 in range(tile_height):
-            for d2 in range(tile_packed_w):
-                val = mm[tile_start_offset + pix_offset]
-                pix_offset += 1
-
-                # One byte packs _2_ pixel values in the [0-15] range (we get them using a bit_mask)
-                # (This packing is possible since the EGA mode only allows 16 colors...)
-                pixel2_col = (val & 0x0f)
-                pixel1_col = (val & 0xf0) >> 4  # >>4 to shift bits right => gives a [0-15] value
-
-                tile_pixels_row.append(pixel1_col)
-                tile_pixels_row.append(pixel2_col)
-
-                group_esc_codes = ''.join(
-                    (group_esc_codes, get_esc_color_codes(pixel1_col), get_esc_color_codes(pixel2_col)))
-
-            tile_pixels.append(tile_pixels_row)
-
-            hexa = map((lambda v: "{0:#04x}".format(v)), tile_pixels_row)
-            group_hexa = ' '.join(hexa)  # stores the HEX values of the tile
-
-            out = "{0:6}: {1}   {2} [{3}]".format(hex(tile_start_offset - tile_packed_w), group_hexa, group_esc_codes,
-                                                  d1 + 1)
-            print(out)
-            tile_pixels_row = []
-            group_hexa = ""
-            group_esc_codes = ""
-
-        # Generate a PNG of the tile
-        im = Image.new("RGB", (tile_width, tile_height))
-        draw = ImageDraw.Draw(im)
-        for d1 in range(tile_height):
-            for d2 in range(tile_width):
-                px = tile_pixels[d1][d2]
-                draw.point((d2, d1), fill=colors[px][2])
-        del draw
-        im2 = im.resize((tile_width * scale_factor, tile_height * scale_factor))  # the tile is scaled
-        im2.save("{0}__{1:02}.png".format(filename, num_tile), "PNG")
+        # All the tiles are decoded at once
+        # (tiles_pixels[num_tile][row][col] is the color of a pixel, see mc1/tiles.py)
+        tiles_pixels = tile_file.tiles()
+
+    for num_tile, (tile_start_offset, tile_pixels) in enumerate(zip(tiles_offset, tiles_pixels)):
+        with timings.phase('console'):
+            print("======= {0}/{1} ======= ".format(num_tile + 1, len(tiles_offset)))
+
+            for d1, tile_pixels_row in enumerate(tile_pixels.tolist()):
+                group_hexa = ' '.join([hexa_values[px] for px in tile_pixels_row])  # stores the HEX values of the tile
+                group_esc_codes = ''.join([console_pixels[px] for px in tile_pixels_row])
+
+                out = "{0:6}: {1}   {2} [{3}]".format(hex(tile_start_offset - tile_packed_w), group_hexa,
+                                                      group_esc_codes, d1 + 1)
+                print(out)
+
+        # Generate a PNG of the tile (scaled)
+        save_png(tile_image(tile_pixels, scale_factor), "{0}__{1:02}.png".format(filename, num_tile))
 
         print()
+
+
+def read_tiles(filename):
+    """
+    :return: (tile offsets, decoded tiles) of a Tile file
+    """
+    with TileFile(filename) as tile_file:
+        return tile_file.offsets, tile_file.tiles()
+
+
+def batch_extract(directories, args):
+    """
+    Batch mode: extract the Tile files of the directories which changed (see mc1/extract.py)
+    :return: the number of Tile files which could not be extracted
+    """
+    counts = {'extracted': 0, 'skipped': 0, 'error': 0}
+    start = time.perf_counter()
+    for num, (tilefile, status, outputs, error, elapsed) in enumerate(extract_directories(
+            directories, args.out_dir, args.scale, args.atlas, args.columns, args.jobs, args.force)):
+        counts[status] += 1
+        print("[{0}] {1}: {2}, {3} file(s), {4:.1f} ms".format(num + 1, tilefile, error or status, outputs,
+                                                              elapsed * 1000), file=sys.stderr)
+    print("{extracted} extracted, {skipped} skipped, {error} error(s)".format(**counts), end='', file=sys.stderr)
+    print(" in {0:.3f} s".format(time.perf_counter() - start), file=sys.stderr)
+    return counts['error']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract the images of EGA Tile files (TILES/EGAxx.TIL).')
+    parser.add_argument('tilefiles', nargs='+', metavar='EGAxx.TIL', help='Tile files or TILES directories')
+    parser.add_argument('--header', action='store_true', help='Only display the header table of the Tile files')
+    parser.add_argument('--atlas', action='store_true',
+                        help='Pack the tiles in a PNG sheet with a JSON index (one per Tile file, see --output)')
+    parser.add_argument('--halfblock', action='store_true',
+                        help='Only display a compact preview of the tiles (24-bit colors, see --columns)')
+    parser.add_argument('-o', '--output', metavar='ATLAS.png', help='A single atlas for all the Tile files')
+    parser.add_argument('--columns', type=int, default=16, metavar='N',
+                        help='Tiles per row of the atlas or of the preview (default: 16)')
+    parser.add_argument('--scale', type=int, default=scale_factor, metavar='N',
+                        help='Scale factor of the images (default: %s)' % scale_factor)
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='Directory of the images (batch mode, default: the TILES directory)')
+    parser.add_argument('-j', '--jobs', type=int, metavar='N',
+                        help='Number of processes (batch mode, default: number of CPUs)')
+    parser.add_argument('--force', action='store_true',
+                        help='Extract all the Tile files, even the unchanged ones (batch mode)')
+    timings.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.columns < 1 or args.scale < 1 or (args.jobs is not None and args.jobs < 1):
+        sys.exit("ERROR: --columns, --scale & --jobs must be positive")
+
+    directories = [path for path in args.tilefiles if os.path.isdir(path)]
+    if (args.atlas and args.output) or args.header or args.halfblock:
+        # a single atlas, or no file written: the directories are replaced by their Tile files
+        args.tilefiles = [name for path in args.tilefiles
+                          for name in (find_tilefiles(path) if path in directories else [path])]
+        directories = []
+    tilefiles = [path for path in args.tilefiles if path not in directories]
+
+    with timings.instrumented(args):
+        try:
+            if not args.header:  # (the header does not need NumPy & PIL)
+                import_libraries()
+            if directories:
+                with timings.phase('extract'):  # (batch mode: the pool of processes)
+                    failed = batch_extract(directories, args)
+                if failed:
+                    sys.exit("ERROR: some Tile files could not be extracted")
+            if args.header:
+                for filename in tilefiles:
+                    with TileFile(filename) as tile_file:
+                        print(filename)
+                        print_header(tile_file.offsets)
+            elif args.halfblock:
+                from mc1.console import render_tiles
+
+                for filename in tilefiles:
+                    tiles = read_tiles(filename)[1]
+                    with timings.phase('console'):
+                        sys.stdout.write("{0}\n{1}".format(filename, render_tiles(tiles, args.columns)))
+            elif not args.atlas:
+                for filename in tilefiles:
+                    extract_tiles(filename, args.scale)
+            elif args.output:
+                tilesets = [(filename,) + read_tiles(filename) for filename in tilefiles]
+                index = save_atlas(args.output, tilesets, args.columns, args.scale)
+                print("{0}: {1} tiles".format(args.output, len(index)))
+            else:
+                for filename in tilefiles:
+                    atlas = "{0}__atlas.png".format(filename)
+                    index = save_atlas(atlas, [(filename,) + read_tiles(filename)], args.columns, args.scale)
+                    print("{0}: {1} tiles".format(atlas, len(index)))
+        except (OSError, ValueError, IndexError) as e:
+            sys.exit("ERROR: %s" % e)
+
+
+if __name__ == '__main__':
+    main()
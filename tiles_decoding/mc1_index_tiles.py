@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.extract import find_tilefiles
+from mc1.tileindex import build_index, file_numbers, hash_ids, load_index, occurrences, resolve, save_index, unique_tiles
+from mc1.tiles import TILE_PACKED_SIZE, save_atlas, tile_image
+
+"""
+This script builds a cross-file index of the tiles of "The Magic Candle 1" Tile files (TILES/EGAxx.TIL):
+the identical tiles are only stored once (see mc1/tileindex.py for the index file format).
+License: GPLv3
+
+USAGE:  python3 <script> build -o TILES.idx [--store DIR] [--atlas UNIQUE.png] [--scale N] <TILES directory or EGAxx.TIL> [...]
+        python3 <script> lookup TILES.idx <EGAxx.TIL:tile number | tile id | hash> [...]
+
+build:  index the tiles, optionally write the deduplicated tiles: one PNG per unique tile (DIR/tile_NNNN.png)
+        and/or an atlas of the unique tiles (tile id = position in the atlas, see its JSON index)
+lookup: print the tile id, the hash & all the occurrences (Tile file, tile number, offset) of tiles
+
+Ex: python3 mc1_index_tiles.py build -o tiles.idx --store unique/ TILES/
+    python3 mc1_index_tiles.py lookup tiles.idx EGA17.TIL:5
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-file index of the tiles of the Tile files (deduplicated).')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Index the tiles of Tile files')
+    build_parser.add_argument('paths', nargs='+', metavar='EGAxx.TIL', help='Tile files or TILES directories')
+    build_parser.add_argument('-o', '--output', required=True, metavar='TILES.idx', help='The index file')
+    build_parser.add_argument('--store', metavar='DIR', help='Write one PNG per unique tile in DIR')
+    build_parser.add_argument('--atlas', metavar='UNIQUE.png', help='Write an atlas of the unique tiles')
+    build_parser.add_argument('--scale', type=int, default=2, metavar='N',
+                              help='Scale factor of the images (default: 2)')
+
+    lookup_parser = subparsers.add_parser('lookup', help='Find the occurrences of tiles')
+    lookup_parser.add_argument('index', metavar='TILES.idx')
+    lookup_parser.add_argument('tiles', nargs='+', metavar='TILE', help='EGAxx.TIL:tile number, tile id or hash')
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'build':
+            if args.scale < 1:
+                sys.exit("ERROR: --scale must be positive")
+            tilefiles = []
+            for path in args.paths:
+                tilefiles += find_tilefiles(path) if os.path.isdir(path) else [path]
+            index = build_index(tilefiles)
+            save_index(index, args.output)
+            if args.store:
+                os.makedirs(args.store, exist_ok=True)
+                for tile_id, tile_pixels in enumerate(unique_tiles(index)):
+                    name = os.path.join(args.store, "tile_{0:04}.png".format(tile_id))
+                    tile_image(tile_pixels, args.scale).save(name, "PNG")
+            if args.atlas:
+                # ('tile' = tile id, 'offset' = position of the tile in the tile store of the index)
+                store_offsets = [tile_id * TILE_PACKED_SIZE for tile_id in range(len(index['tiles']))]
+                save_atlas(args.atlas, [(args.output, store_offsets, unique_tiles(index))], scale_factor=args.scale)
+            print("{0} file(s), {1} tiles, {2} unique tiles".format(len(index['files']), len(index['refs']),
+                                                                     len(index['tiles'])), file=sys.stderr)
+        else:
+            index = load_index(args.index)
+            numbers = file_numbers(index)
+            hashes = hash_ids(index)
+            for tile in args.tiles:
+                name, _, num_tile = tile.rpartition(':')
+                if name:
+                    if os.path.basename(name) not in numbers:
+                        sys.exit("ERROR: %s is not indexed" % name)
+                    tile_id = resolve(index, numbers[os.path.basename(name)], int(num_tile, 0))
+                elif tile.lower() in hashes:
+                    tile_id = hashes[tile.lower()]
+                else:
+                    tile_id = int(tile, 0)
+                    if not 0 <= tile_id < len(index['tiles']):
+                        sys.exit("ERROR: no tile id %s (%s unique tiles)" % (tile, len(index['tiles'])))
+                print("{0}\ttile id {1}\thash {2}".format(tile, tile_id, index['hashes'][tile_id].tobytes().hex()))
+                for tilefile, num, offset in occurrences(index, tile_id):
+                    print("\t{0}\t{1}\t{2:#06x}".format(tilefile, num, offset))
+    except (OSError, ValueError, IndexError) as e:
+        sys.exit("ERROR: %s" % e)
+
+
+if __name__ == '__main__':
+    main()
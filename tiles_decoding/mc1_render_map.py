@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from mc1.maps import read_grid_raw, read_grid_text, render_map
+from mc1.tileindex import load_index, unique_tiles
+from mc1.tiles import TileFile, palette_image, scale_pixels
+
+"""
+This script renders a map of "The Magic Candle 1" (a map is simply a grid of tiles) as a PNG file.
+License: GPLv3
+
+USAGE:  python3 <script> --tiles <EGAxx.TIL | TILES.idx> [--raw WIDTH [--skip N]] [--region C,R,W,H | --viewport X,Y,W,H]
+                         [--scale N] -o MAP.png <grid file>
+
+The tile set is a Tile file (the grid gives tile numbers) or a tile index built by mc1_index_tiles.py
+(the grid gives tile ids).
+The grid file is a text file (one row of the map per line, tile numbers separated by spaces, '.' = empty cell),
+or, with --raw WIDTH, a binary file: one byte per cell, WIDTH cells per row (after the first N bytes with --skip).
+(The map files of the game are not decoded yet, see mc1/maps.py)
+
+--region C,R,W,H   only render W x H tiles, from the tile at column C, row R
+--viewport X,Y,W,H only render W x H pixels, from the pixel (X, Y) (unscaled coordinates)
+
+Ex: python3 mc1_render_map.py --tiles TILES/EGA17.TIL --raw 64 -o castle.png castle.map
+"""
+
+
+def quadruplet(text):
+    values = [int(value, 0) for value in text.split(',')]
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError("4 comma separated values are expected: %s" % text)
+    return tuple(values)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render a map (a grid of tiles) as a PNG file.')
+    parser.add_argument('grid', metavar='GRID', help='The grid of tile numbers (text, or binary with --raw)')
+    parser.add_argument('--tiles', required=True, metavar='EGAxx.TIL', help='The tile set: Tile file or tile index')
+    parser.add_argument('-o', '--output', required=True, metavar='MAP.png', help='The PNG file')
+    parser.add_argument('--raw', type=int, metavar='WIDTH', help='Binary grid: one byte per cell, WIDTH cells per row')
+    parser.add_argument('--skip', type=int, default=0, metavar='N', help='Binary grid: skip the first N bytes')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--region', type=quadruplet, metavar='C,R,W,H', help='Only render a region (in tiles)')
+    group.add_argument('--viewport', type=quadruplet, metavar='X,Y,W,H', help='Only render a viewport (in pixels)')
+    parser.add_argument('--scale', type=int, default=1, metavar='N', help='Scale factor of the image (default: 1)')
+    args = parser.parse_args(argv)
+    if args.scale < 1:
+        sys.exit("ERROR: --scale must be positive")
+
+    start = time.perf_counter()
+    try:
+        try:
+            tiles = unique_tiles(load_index(args.tiles))
+        except ValueError:  # not a tile index: a Tile file
+            with TileFile(args.tiles) as tile_file:
+                tiles = tile_file.tiles()
+
+        if args.raw is not None:
+            with open(args.grid, 'rb') as f:
+                grid = read_grid_raw(f.read(), args.raw, args.skip)
+        else:
+            with open(args.grid) as f:
+                grid = read_grid_text(f)
+
+        canvas = render_map(grid, tiles, args.region, args.viewport)
+        palette_image(scale_pixels(canvas, args.scale)).save(args.output, "PNG")
+    except (OSError, ValueError, IndexError) as e:
+        sys.exit("ERROR: %s" % e)
+
+    print("{0}: {1} x {2} tiles, {3} x {4} pixels in {5:.3f} s".format(
+        args.output, grid.shape[1], grid.shape[0], canvas.shape[1] * args.scale, canvas.shape[0] * args.scale,
+        time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()